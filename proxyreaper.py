@@ -20,8 +20,10 @@ APP_NAME = "Proxy Reaper"
 VERSION = "2.2.0"
 
 import argparse
+import asyncio
 import requests
 import socks
+import urllib3
 import socket
 import time
 import threading
@@ -31,16 +33,43 @@ import re
 import sys
 import signal
 import os
+import ssl
+import struct
+import base64
 import sqlite3
 import configparser
 import hashlib
+import codecs
+import contextlib
+import heapq
+import http.client
 import concurrent.futures
+import collections
+import errno
+import selectors
+import multiprocessing
+import queue
 import glob
+import itertools
+import math
+import ipaddress
+import array
+import bisect
 from pathlib import Path
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urljoin
 from concurrent.futures import ThreadPoolExecutor
 from colorama import init as colorama_init, Fore, Back, Style
 
+try:
+    import resource  # POSIX only; used to raise the open-file limit for the asyncio engine
+except ImportError:
+    resource = None
+
+try:
+    import maxminddb  # optional; reads MaxMind .mmdb files for --geoip-db
+except ImportError:
+    maxminddb = None
+
 # Initialize Colorama for ANSI color support (also on Windows)
 colorama_init(autoreset=True)
 
@@ -50,9 +79,21 @@ print_lock = threading.Lock()
 # Global args variable to make debug flag accessible
 global_args = None
 
-# Global cache for GeoIP lookups (guarded by geoip_cache_lock for thread safety)
-geoip_cache = {}
-geoip_cache_lock = threading.Lock()
+# In-memory caches of GeoIP and reverse DNS lookups (LRUCache, see create_caches),
+# split into lock stripes so concurrent workers rarely contend
+geoip_cache = None
+rdns_cache = None
+CACHE_STRIPES = 16
+DEFAULT_CACHE_SIZE = 100000  # entries per cache
+
+# Offline GeoIP (--geoip-db): the OfflineGeoIP database when loaded, and
+# whether IPs it does not cover are looked up online
+geoip_offline = None
+geoip_online = True
+
+# Persistent GeoIP cache (--geoip-cache): the GeoIPStore when enabled
+geoip_store = None
+GEOIP_STORE_BATCH = 50  # new entries buffered before they are written to the file
 
 # Shared HTTP session for non-proxied calls (public IP + GeoIP lookups).
 # Reuses connections to the same endpoints across many proxies (keep-alive).
@@ -63,9 +104,97 @@ global_results = []
 results_counter = 0
 AUTOSAVE_FREQUENCY = 5  # Save after every 5 proxies
 
+# Queued checks per worker in the threaded scheduler (bounded, streaming submission)
+SUBMIT_WINDOW_FACTOR = 2
+
+# Per-network caps (--max-per-host / --max-per-subnet): proxies buffered ahead
+# of the window to find work on other networks while a network is at its cap
+SCHEDULER_LOOKAHEAD = 10000
+
+# Hard request deadline of the threaded engine (see RequestWatchdog): each
+# thread's watched request, and the urllib3 pool/connection classes that report to it
+watched_request = threading.local()
+watched_classes = {}
+
+# Set in --processes workers: results are sent to the parent instead of being stored locally
+result_queue = None
+
 # Status constants for proxy checks
 STATUS_FAILED = "FAILED"
 
+# Failure classes of a connectivity test (see classify_error)
+ERROR_TIMEOUT = "timeout"
+ERROR_REFUSED = "refused"
+ERROR_RESET = "reset"
+ERROR_LOCAL = "local"      # our own machine ran out of sockets, buffers or ports
+ERROR_SSL = "ssl"
+ERROR_PROXY = "proxy"
+ERROR_OTHER = "other"
+ERROR_DEADLINE = "deadline"  # request ran past its wall-clock deadline (e.g. a slow-drip proxy)
+ERROR_OVERSIZE = "oversize"  # response body larger than the response size limit
+
+# errno values that point at local resource exhaustion rather than a dead proxy
+LOCAL_SOCKET_ERRNOS = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM, errno.EADDRNOTAVAIL}
+
+# Adaptive concurrency (AIMD) tuning
+ADAPTIVE_INTERVAL = 2.0            # seconds between adjustments
+ADAPTIVE_MIN_SAMPLES = 20          # finished checks required per adjustment
+ADAPTIVE_STEP = 5                  # additive increase per interval
+ADAPTIVE_DECREASE = 0.7            # multiplicative decrease on congestion
+ADAPTIVE_TIMEOUT_TOLERANCE = 0.15  # timeout rate above the best interval that counts as congestion
+
+# Set in main() when --adaptive is active
+concurrency_controller = None
+
+# Adaptive timeouts (--adaptive-timeout): the TimeoutTuner when enabled
+TIMEOUT_HISTOGRAM_GROWTH = 1.1  # each latency bucket is 10% wider than the previous one
+TIMEOUT_MIN_SAMPLES = 50        # working checks needed before the timeout adapts
+timeout_tuner = None
+
+# Staged pipeline (--enrich-workers): executor and metrics of the running stages
+enrichment_executor = None
+pipeline_stages = {}
+pipeline_last_report = 0.0
+PIPELINE_REPORT_INTERVAL = 5.0  # seconds between queue-depth debug lines
+
+# TLS client context for proxy handshakes and the asyncio engine, built once per process (see tls_client_context)
+tls_context = None
+
+# Staged pipeline of the asyncio engine: enrichment concurrency limit and running tasks
+enrichment_semaphore = None
+enrichment_tasks = set()
+
+# Retry/hedging policy (--retry, --hedge): failed checks waiting for another
+# attempt as (proxy, attempt, progress), and counters for the summary
+retry_queue = collections.deque()
+retry_stats = {'retried': 0, 'recovered': 0, 'hedged': 0, 'second_pass': 0}
+retry_lock = threading.Lock()
+recent_latencies = collections.deque(maxlen=1000)  # ms of recent working checks
+HEDGE_MIN_SAMPLES = 20  # working checks needed before hedging starts
+
+# Limits of every proxied request (--request-deadline, --max-response): wall-clock
+# seconds (0 = twice the request's timeout) and the largest body read in full
+DEFAULT_MAX_RESPONSE_BYTES = 1024 * 1024
+request_deadline = 0.0
+max_response_bytes = DEFAULT_MAX_RESPONSE_BYTES
+
+# Whole-run time budget (--budget): time.time() by which the run must end
+run_deadline = None
+BUDGET_MIN_TIMEOUT = 1.0  # no new checks start with less time left; shortest per-check timeout
+
+# Early stop (--want N): filters a result must pass to count, number wanted and
+# found so far; early_stop is set once enough were found and ends the run
+want_filters = None
+want_target = 0
+want_found = 0
+early_stop = threading.Event()
+
+# Per-destination token buckets from the [ratelimits] config section, by hostname
+rate_limiters = {}
+
+# Outcome history (--history): weight of the newest response time in the running average
+HISTORY_LATENCY_WEIGHT = 0.3
+
 # Response time categories (in milliseconds)
 SPEED_ULTRAFAST = "ultrafast"  # < 100ms
 SPEED_FAST = "fast"            # 100-500ms
@@ -79,12 +208,32 @@ SPEED_THRESHOLDS = {
     SPEED_SLOW: (1000, float('inf'))
 }
 
+# Basis of the speed category: full (size-capped) request or time to first byte
+SPEED_BASIS_TOTAL = "total"
+SPEED_BASIS_TTFB = "ttfb"
+DEFAULT_TEST_MAX_BYTES = 65536  # the speed test stops reading the body after this many bytes
+TIMING_FIELDS = ("connect_time", "handshake_time", "ttfb")
+
+# Check levels (--level); each level includes the ones below it
+LEVEL_TCP = 0        # TCP connect to the proxy
+LEVEL_HANDSHAKE = 1  # SOCKS4/SOCKS5 handshake or HTTP CONNECT to the test URL's host
+LEVEL_REQUEST = 2    # full request of the test URL
+LEVEL_FULL = 3       # request plus anonymity, GeoIP and reverse DNS
+
 # Anonymity level constants
 ANONYMITY_HIGH = "High Anonymous"
 ANONYMITY_ANONYMOUS = "Anonymous"
 ANONYMITY_HEADER_LEAK = "Anonymous (Header leak)"
 ANONYMITY_TRANSPARENT = "Transparent"
 ANONYMITY_FAILED = "Failed"
+ANONYMITY_NOT_CHECKED = "Not checked"  # check level below 3 (--level)
+
+# Headers sent with the anonymity check request
+ANONYMITY_CHECK_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+}
 
 # Protocol constants
 PROTOCOL_HTTP = "http"
@@ -160,7 +309,8 @@ COUNTRY_TO_CODE = {v.lower(): k for k, v in COUNTRY_CODES.items()}
 # Output file constants
 DEFAULT_OUTPUT_DIR = "results"
 DEFAULT_OUTPUT_FORMAT = "csv"
-CSV_FIELDNAMES = ["proxy", "hostname", "status", "speed_category", "response_time", "country", "city", "anonymity", "protocol", "check_time"]
+CSV_FIELDNAMES = ["proxy", "hostname", "status", "error", "speed_category", "response_time", "connect_time", "handshake_time", "ttfb",
+                  "country", "city", "anonymity", "protocol", "check_time"]
 
 # Integrated banner ASCII art without version info.
 BANNER_TEXT = r"""
@@ -182,7 +332,20 @@ DEFAULT_CONFIG = {
     'general': {
         'timeout': '5',
         'concurrent': '10',
-        'test_url': 'https://www.google.com'
+        'enrich_workers': '0',
+        'max_per_host': '0',
+        'max_per_subnet': '0',
+        'budget': '0',
+        'want': '0',
+        'first_pass_timeout': '0',
+        'test_url': 'https://www.google.com',
+        'test_max_bytes': '65536',
+        'request_deadline': '0',
+        'max_response_bytes': '1048576',
+        'speed_basis': 'total',
+        'level': '3',
+        'engine': 'threads',
+        'processes': '1'
     },
     'output': {
         'format': 'json',
@@ -192,9 +355,31 @@ DEFAULT_CONFIG = {
     'proxysources': {
         'urls': ''  # Comma-separated list of URLs
     },
+    'ratelimits': {},  # hostname = requests per second[/burst], e.g. ipinfo.io = 2/5
     'advanced': {
         'debug': 'false',
-        'anonymity_check_url': 'https://httpbin.org/get'
+        'anonymity_check_url': 'https://httpbin.org/get',
+        'prefilter': 'false',
+        'prefilter_concurrency': '1000',
+        'adaptive': 'false',
+        'adaptive_min': '5',
+        'adaptive_max': '200',
+        'adaptive_timeout': 'false',
+        'timeout_percentile': '99',
+        'timeout_factor': '1.5',
+        'timeout_min': '1',
+        'timeout_max': '30',
+        'single_request': 'false',
+        'detect_protocol': 'false',
+        'retry': '',
+        'hedge_percentile': '0',
+        'history_file': '',
+        'geoip_cache_file': '',
+        'geoip_cache_ttl': '720',
+        'geoip_negative_ttl': '6',
+        'geoip_database': '',
+        'geoip_online': 'true',
+        'cache_size': str(DEFAULT_CACHE_SIZE)
     }
 }
 
@@ -241,13 +426,14 @@ def debug_print(message, level="info", lock=None):
     }
 
     color = colors.get(level, Fore.WHITE)
-    formatted_message = f"{color}{message}{Style.RESET_ALL}"
+    # Newline included so each line is a single write (no interleaving between --processes workers)
+    formatted_message = f"{color}{message}{Style.RESET_ALL}\n"
 
     if lock:
         with lock:
-            print(formatted_message, flush=True)
+            print(formatted_message, end="", flush=True)
     else:
-        print(formatted_message, flush=True)
+        print(formatted_message, end="", flush=True)
 
 def display_banner():
     """
@@ -349,6 +535,25 @@ def override_config_with_args(config, args):
     arg_map = {
         'timeout': ('general', 'timeout'),
         'concurrent': ('general', 'concurrent'),
+        'engine': ('general', 'engine'),
+        'processes': ('general', 'processes'),
+        'enrich_workers': ('general', 'enrich_workers'),
+        'max_per_host': ('general', 'max_per_host'),
+        'max_per_subnet': ('general', 'max_per_subnet'),
+        'budget': ('general', 'budget'),
+        'want': ('general', 'want'),
+        'first_pass': ('general', 'first_pass_timeout'),
+        'history': ('advanced', 'history_file'),
+        'geoip_cache': ('advanced', 'geoip_cache_file'),
+        'geoip_db': ('advanced', 'geoip_database'),
+        'cache_size': ('advanced', 'cache_size'),
+        'max_bytes': ('general', 'test_max_bytes'),
+        'request_deadline': ('general', 'request_deadline'),
+        'max_response': ('general', 'max_response_bytes'),
+        'speed_basis': ('general', 'speed_basis'),
+        'level': ('general', 'level'),
+        'retry': ('advanced', 'retry'),
+        'hedge': ('advanced', 'hedge_percentile'),
         'url': ('general', 'test_url'),
         'output': ('output', 'format'),
         'fast_only': ('output', 'fast_only'),
@@ -398,7 +603,7 @@ def get_public_ip():
     debug_print("Could not determine public IP from any service", "warning", print_lock)
     return "Unknown"
 
-def parse_proxies(proxy_input, auto_mode=False):
+def parse_proxies(proxy_input, auto_mode=False, keep_bare=False):
     """
     Parse proxy input which can be a single proxy, a comma-separated list,
     a file path, glob patterns, or URLs in automatic mode.
@@ -406,6 +611,7 @@ def parse_proxies(proxy_input, auto_mode=False):
     Args:
         proxy_input (str): Input string containing proxies, file path, or glob pattern
         auto_mode (bool): Whether to download proxies from URLs
+        keep_bare (bool): Keep host:port entries without protocol (for detect_protocols)
 
     Returns:
         list: List of parsed proxies
@@ -485,19 +691,20 @@ def parse_proxies(proxy_input, auto_mode=False):
         debug_print(f"Using single proxy: {proxy_input}", "debug", print_lock)
 
     # Validate and normalize proxies
-    valid_proxies = validate_proxies(proxies)
+    valid_proxies = validate_proxies(proxies, keep_bare)
 
     if not valid_proxies:
         debug_print("No valid proxies found after validation.", "error", print_lock)
 
     return valid_proxies
 
-def validate_proxies(proxies):
+def validate_proxies(proxies, keep_bare=False):
     """
     Validate and normalize proxy formats.
 
     Args:
         proxies (list): List of proxy strings to validate
+        keep_bare (bool): Keep host:port entries without protocol instead of assuming http://
 
     Returns:
         list: List of validated and normalized proxies
@@ -569,8 +776,8 @@ def validate_proxies(proxies):
                     invalid_proxies.append((proxy, "Invalid hostname"))
                     continue
 
-                # Use http as default protocol
-                valid_proxies.append(f"http://{host}:{port}")
+                # Use http as default protocol unless the protocol is detected later
+                valid_proxies.append(f"{host}:{port}" if keep_bare else f"http://{host}:{port}")
             else:
                 invalid_proxies.append((proxy, "Invalid format, expected host:port"))
 
@@ -601,10 +808,366 @@ def sanitize_proxy(proxy):
     """
     return re.sub(r'[^a-zA-Z0-9.:@/_-]', '', proxy)
 
+class LRUCache:
+    """
+    Size-capped, thread-safe lookup cache with least-recently-used eviction.
+
+    Keys are spread over CACHE_STRIPES independently locked stripes, each
+    holding an equal share of the capacity, so concurrent lookups of different
+    keys rarely wait for each other. Every stripe counts hits, misses,
+    evictions and hits on negative entries (failed lookups kept so they are
+    not retried at once).
+
+    get_or_load() is single-flight: callers missing a key that is already
+    being looked up wait on that lookup's future instead of starting their
+    own, so many proxies on one host finishing at once cost one lookup.
+    """
+
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = capacity  # 0 = unlimited
+        # A small cap gets fewer stripes, so the cap holds (rounded up to a multiple of the stripes)
+        stripe_count = min(CACHE_STRIPES, capacity) if capacity > 0 else CACHE_STRIPES
+        per_stripe = -(-capacity // stripe_count) if capacity > 0 else 0
+        # (entries, lock, counters, size cap, futures of the lookups in flight)
+        self.stripes = [(collections.OrderedDict(), threading.Lock(), collections.Counter(), per_stripe, {})
+                        for _ in range(stripe_count)]
+
+    def _stripe(self, key):
+        return self.stripes[hash(key) % len(self.stripes)]
+
+    def get_or_load(self, key, load):
+        """
+        Returns the cached value of key (marking it recently used). On a miss,
+        load() is called and must return (value, negative); concurrent callers
+        for the same key wait for that call instead of repeating it.
+        """
+        entries, lock, counters, _, loading = self._stripe(key)
+        with lock:
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+                counters['hits'] += 1
+                if entry[1]:
+                    counters['negative_hits'] += 1
+            else:
+                future = loading.get(key)
+                leader = future is None
+                if leader:
+                    future = loading[key] = concurrent.futures.Future()
+                    counters['misses'] += 1
+                else:
+                    counters['coalesced'] += 1
+        if entry is not None:
+            debug_print(f"{self.name} cache hit for {key}{' (negative)' if entry[1] else ''}", "debug", print_lock)
+            return entry[0]
+        if not leader:
+            debug_print(f"{self.name} lookup for {key} already in flight, waiting for it", "debug", print_lock)
+            return future.result()
+        try:
+            value, negative = load()
+        except BaseException as e:
+            # Waiting callers get the same exception; nothing is cached
+            with lock:
+                del loading[key]
+            future.set_exception(e)
+            raise
+        # Cached before the future is dropped, so later callers find either one
+        self.put(key, value, negative)
+        with lock:
+            del loading[key]
+        future.set_result(value)
+        return value
+
+    def put(self, key, value, negative=False):
+        """Stores a value; negative marks a failed lookup. Evicts the least recently used entry when full."""
+        entries, lock, counters, limit, _ = self._stripe(key)
+        with lock:
+            entries[key] = (value, negative)
+            entries.move_to_end(key)
+            if limit and len(entries) > limit:
+                entries.popitem(last=False)
+                counters['evictions'] += 1
+
+    def stats(self):
+        """Returns the counters (mergeable across processes)."""
+        totals = {'entries': 0, 'hits': 0, 'misses': 0, 'coalesced': 0, 'negative_hits': 0, 'evictions': 0}
+        for entries, lock, counters, _, _ in self.stripes:
+            with lock:
+                totals['entries'] += len(entries)
+                for key in ('hits', 'misses', 'coalesced', 'negative_hits', 'evictions'):
+                    totals[key] += counters[key]
+        return totals
+
+def describe_cache(stats, capacity):
+    """
+    Summary line of an in-memory lookup cache.
+
+    Args:
+        stats (dict): Counters from LRUCache.stats() (possibly summed over processes)
+        capacity (int): Configured size cap (0 = unlimited)
+
+    Returns:
+        str: Description for the summary
+    """
+    lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+    hit_rate = stats['hits'] / lookups * 100 if lookups else 0.0
+    size = f"max {capacity}" if capacity else "unlimited"
+    return (f"{stats['entries']} entries ({size}), {stats['hits']} hits ({hit_rate:.1f}%), "
+            f"{stats['misses']} misses, {stats['coalesced']} waited for a lookup in flight, "
+            f"{stats['negative_hits']} negative hits, {stats['evictions']} evictions")
+
+def create_caches(capacity):
+    """
+    Replaces the GeoIP and reverse DNS caches with empty ones of the given size.
+
+    Args:
+        capacity (int): Maximum entries per cache (0 = unlimited)
+
+    Returns:
+        None
+    """
+    global geoip_cache, rdns_cache
+    geoip_cache = LRUCache("GeoIP", capacity)
+    rdns_cache = LRUCache("Reverse DNS", capacity)
+
+class OfflineGeoIP:
+    """
+    Country/city lookups from a local IP-range database (--geoip-db).
+
+    A CSV file with "start,end,country[,city]" rows (addresses dotted or as
+    integers, IPv4 and IPv6 mixed) is loaded into sorted arrays of range starts
+    and ends plus indexes into the distinct country and city names, so a
+    lookup is one binary search. A MaxMind .mmdb file is read with the optional
+    maxminddb package instead, which has its own search tree.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.reader = None
+        self.names = []  # distinct country and city names
+        # IPv4 ranges in compact arrays; IPv6 values do not fit, so plain lists
+        self.tables = {4: (array.array('L'), array.array('L'), array.array('L'), array.array('L')),
+                       6: ([], [], array.array('L'), array.array('L'))}
+        self.ranges = 0
+        self.skipped = 0
+
+    @staticmethod
+    def parse_address(value):
+        """Returns (version, integer) of a dotted or integer address."""
+        value = value.strip()
+        if value.isdigit():
+            number = int(value)
+            return (4 if number < 2 ** 32 else 6), number
+        address = ipaddress.ip_address(value)
+        return address.version, int(address)
+
+    def load(self):
+        """Reads the database file; raises OSError or ValueError if it is unusable."""
+        if self.filename.endswith('.mmdb'):
+            if maxminddb is None:
+                raise ValueError("reading .mmdb files needs the maxminddb package (pip install maxminddb)")
+            self.reader = maxminddb.open_database(self.filename)
+            return
+        interned = {}
+        rows = {4: [], 6: []}
+        with open(self.filename, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                if len(row) < 3 or row[0].startswith('#'):
+                    continue
+                try:
+                    version, start = self.parse_address(row[0])
+                    _, end = self.parse_address(row[1])
+                except ValueError:
+                    self.skipped += 1  # header line or garbage
+                    continue
+                country = row[2].strip()
+                # Country codes become names, as the online services and the TLD filter use them
+                country = COUNTRY_CODES.get(country.lower(), country) if len(country) == 2 else country
+                city = row[3].strip() if len(row) > 3 and row[3].strip() else "Unknown"
+                rows[version].append((start, end, interned.setdefault(country, len(interned)),
+                                      interned.setdefault(city, len(interned))))
+        self.names = list(interned)
+        for version, version_rows in rows.items():
+            version_rows.sort()
+            starts, ends, countries, cities = self.tables[version]
+            for start, end, country, city in version_rows:
+                starts.append(start)
+                ends.append(end)
+                countries.append(country)
+                cities.append(city)
+            self.ranges += len(version_rows)
+
+    def lookup(self, ip):
+        """Returns (country, city) of an IP address, or None if the database does not cover it."""
+        try:
+            version, number = self.parse_address(ip)
+        except ValueError:
+            return None  # a hostname
+        if self.reader is not None:
+            try:
+                record = self.reader.get(ip)
+            except ValueError:
+                return None  # an IPv6 address in an IPv4-only database
+            if not record or 'country' not in record:
+                return None
+            country = record['country'].get('names', {}).get('en') or record['country'].get('iso_code', "Unknown")
+            city = record.get('city', {}).get('names', {}).get('en', "Unknown")
+            return country, city
+        starts, ends, countries, cities = self.tables[version]
+        index = bisect.bisect_right(starts, number) - 1
+        if index < 0 or number > ends[index]:
+            return None
+        return self.names[countries[index]], self.names[cities[index]]
+
+    def describe(self):
+        """Returns a one-line description for the summary."""
+        if self.reader is not None:
+            return f"MaxMind database {self.filename}"
+        return f"{self.ranges} ranges from {self.filename}"
+
+def load_offline_geoip(filename):
+    """
+    Loads the offline GeoIP database.
+
+    Args:
+        filename (str): CSV range file or .mmdb file
+
+    Returns:
+        OfflineGeoIP: The loaded database, or None if it cannot be read
+    """
+    started = time.time()
+    database = OfflineGeoIP(filename)
+    try:
+        database.load()
+    except (OSError, ValueError) as e:
+        debug_print(f"Could not load GeoIP database {filename}: {str(e)}", "warning", print_lock)
+        return None
+    debug_print(f"GeoIP database: {database.describe()} loaded in {time.time() - started:.1f} s", "info", print_lock)
+    if database.skipped:
+        debug_print(f"GeoIP database: {database.skipped} unreadable lines skipped", "debug", print_lock)
+    return database
+
+class GeoIPStore:
+    """
+    GeoIP results kept in an SQLite file, shared across runs and processes.
+
+    Every entry carries its own expiry time: `ttl` seconds for a located IP,
+    `negative_ttl` seconds for an IP no service could locate (0 = not stored),
+    so failed lookups are retried sooner. load() warms geoip_cache with all
+    unexpired entries; new results are written in batches of GEOIP_STORE_BATCH
+    to keep the file lock short when several processes share it.
+    """
+
+    def __init__(self, filename, ttl, negative_ttl):
+        self.filename = filename
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.pending = []
+        self.loaded = 0
+        self.lookups = 0  # lookups that went to the online services
+        self.stored = 0
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Opens the file, drops expired entries and returns the remaining ones as {ip: (country, city)}."""
+        entries = {}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+            self.conn = sqlite3.connect(self.filename, timeout=30, check_same_thread=False)
+            self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS geoip (
+                ip TEXT PRIMARY KEY,
+                country TEXT,
+                city TEXT,
+                expires REAL
+            )
+            ''')
+            self.conn.execute("DELETE FROM geoip WHERE expires < ?", (time.time(),))
+            self.conn.commit()
+            for ip, country, city in self.conn.execute("SELECT ip, country, city FROM geoip"):
+                entries[ip] = (country, city)
+        except sqlite3.Error as e:
+            debug_print(f"Could not read GeoIP cache {self.filename}: {str(e)}", "warning", print_lock)
+            self.conn = None
+        self.loaded = len(entries)
+        return entries
+
+    def store(self, ip, country, city, located=True):
+        """Queues a lookup result for the file and writes the queue once it is full."""
+        ttl = self.ttl if located else self.negative_ttl
+        with self.lock:
+            self.lookups += 1
+            if self.conn is None or ttl <= 0:
+                return
+            self.pending.append((ip, country, city, time.time() + ttl))
+            if len(self.pending) >= GEOIP_STORE_BATCH:
+                self._flush()
+
+    def _flush(self):
+        """Writes the queued entries (caller holds self.lock)."""
+        if not self.pending:
+            return
+        try:
+            self.conn.executemany("INSERT OR REPLACE INTO geoip (ip, country, city, expires) VALUES (?, ?, ?, ?)",
+                                  self.pending)
+            self.conn.commit()
+            self.stored += len(self.pending)
+        except sqlite3.Error as e:
+            debug_print(f"Could not update GeoIP cache {self.filename}: {str(e)}", "warning", print_lock)
+        self.pending = []
+
+    def close(self):
+        """Writes the remaining entries and closes the file."""
+        with self.lock:
+            if self.conn is None:
+                return
+            self._flush()
+            self.conn.close()
+            self.conn = None
+
+    def stats(self):
+        """Returns the counters (mergeable across processes)."""
+        with self.lock:
+            return {"loaded": self.loaded, "lookups": self.lookups, "stored": self.stored}
+
+def describe_geoip_store(stats):
+    """
+    Summary line of the persistent GeoIP cache.
+
+    Args:
+        stats (dict): Counters from GeoIPStore.stats() (possibly summed over processes)
+
+    Returns:
+        str: Description for the summary
+    """
+    return f"{stats['loaded']} entries loaded, {stats['lookups']} online lookups, {stats['stored']} entries stored"
+
+def open_geoip_store(settings):
+    """
+    Opens the persistent GeoIP cache and warms geoip_cache with its entries.
+
+    Args:
+        settings (tuple): (filename, ttl, negative_ttl) with the TTLs in seconds
+
+    Returns:
+        GeoIPStore: The opened cache
+    """
+    store = GeoIPStore(*settings)
+    entries = store.load()
+    for ip, located in entries.items():
+        geoip_cache.put(ip, located, negative=located == ("Unknown", "Unknown"))
+    debug_print(f"GeoIP cache: {len(entries)} entries loaded from {store.filename}", "debug", print_lock)
+    return store
+
 def get_geoip_info(ip):
     """
     Get geographical information about an IP address.
-    Uses caching to avoid repeated requests for the same IP.
+    Uses the offline database (--geoip-db) if loaded, then the online services
+    with caching to avoid repeated requests for the same IP (concurrent
+    requests for one IP share a single lookup); with --geoip-cache the results
+    are also kept in a file for later runs.
 
     Args:
         ip (str): IP address to lookup
@@ -612,45 +1175,48 @@ def get_geoip_info(ip):
     Returns:
         tuple: (country, city) information
     """
-    global geoip_cache
-
-    # Check cache first (thread-safe: multiple workers may share a proxy host)
-    with geoip_cache_lock:
-        if ip in geoip_cache:
-            debug_print(f"GeoIP cache hit for {ip}", "debug", print_lock)
-            return geoip_cache[ip]
-
-    debug_print(f"GeoIP lookup for {ip}", "debug", print_lock)
-    services = [
-        {'url': f'https://ipinfo.io/{ip}/json', 'country_key': 'country', 'city_key': 'city'},
-        {'url': f'https://freegeoip.app/json/{ip}', 'country_key': 'country_name', 'city_key': 'city'},
-        {'url': f'https://ipapi.co/{ip}/json/', 'country_key': 'country_name', 'city_key': 'city'}
-    ]
+    if geoip_offline is not None:
+        located = geoip_offline.lookup(ip)
+        if located is not None:
+            return located
+        if not geoip_online:
+            return "Unknown", "Unknown"
+
+    def lookup():
+        debug_print(f"GeoIP lookup for {ip}", "debug", print_lock)
+        services = [
+            {'url': f'https://ipinfo.io/{ip}/json', 'country_key': 'country', 'city_key': 'city'},
+            {'url': f'https://freegeoip.app/json/{ip}', 'country_key': 'country_name', 'city_key': 'city'},
+            {'url': f'https://ipapi.co/{ip}/json/', 'country_key': 'country_name', 'city_key': 'city'}
+        ]
+
+        for service in services:
+            try:
+                throttle(service['url'])
+                response = http_session.get(service['url'], timeout=budget_timeout(3))
+                if response.status_code == 200:
+                    data = response.json()
+                    country = data.get(service['country_key'], "Unknown")
+                    city = data.get(service['city_key'], "Unknown")
 
-    for service in services:
-        try:
-            response = http_session.get(service['url'], timeout=3)
-            if response.status_code == 200:
-                data = response.json()
-                country = data.get(service['country_key'], "Unknown")
-                city = data.get(service['city_key'], "Unknown")
+                    if geoip_store is not None:
+                        geoip_store.store(ip, country, city)
 
-                # Cache the result
-                with geoip_cache_lock:
-                    geoip_cache[ip] = (country, city)
+                    debug_print(f"Got geo info for {ip}: {country}, {city}", "debug", print_lock)
+                    return (country, city), False
+            except (requests.RequestException, json.JSONDecodeError) as e:
+                debug_print(f"Failed to get geo info from {service['url']}: {str(e)}", "debug", print_lock)
+                continue
 
-                debug_print(f"Got geo info for {ip}: {country}, {city}", "debug", print_lock)
-                return country, city
-        except (requests.RequestException, json.JSONDecodeError) as e:
-            debug_print(f"Failed to get geo info from {service['url']}: {str(e)}", "debug", print_lock)
-            continue
+        # The "Unknown" result is cached too, to avoid repeated failures
+        if geoip_store is not None:
+            geoip_store.store(ip, "Unknown", "Unknown", located=False)
+        return ("Unknown", "Unknown"), True
 
-    # Cache the "Unknown" result to avoid repeated failures
-    with geoip_cache_lock:
-        geoip_cache[ip] = ("Unknown", "Unknown")
-    return "Unknown", "Unknown"
+    # Check cache first; workers finishing proxies on the same host at once share one lookup
+    return geoip_cache.get_or_load(ip, lookup)
 
-def check_anonymity(proxy, anonymity_check_url, original_ip):
+def check_anonymity(proxy, anonymity_check_url, original_ip, session=None):
     """
     Checks if a proxy hides the IP address and evaluates its anonymity level.
 
@@ -658,122 +1224,215 @@ def check_anonymity(proxy, anonymity_check_url, original_ip):
         proxy (str): Proxy to check
         anonymity_check_url (str): URL to use for checking anonymity
         original_ip (str): Original IP address for comparison
+        session (requests.Session, optional): Per-proxy session to reuse its kept-alive connection
 
     Returns:
         tuple: (detected_ip, anonymity_level)
     """
+    own_session = session is None
+    if own_session:
+        session = new_check_session()
     try:
         debug_print(f"Checking anonymity for {proxy}", "debug", print_lock)
 
-        # Extended headers to check
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-        }
+        throttle(anonymity_check_url)
+        timeout = budget_timeout(10)
+        deadline = time.monotonic() + request_time_limit(timeout)
+        with request_watchdog.guard(deadline):
+            response = session.get(
+                anonymity_check_url,
+                proxies={"http": proxy, "https": proxy},
+                headers=ANONYMITY_CHECK_HEADERS,
+                timeout=timeout,
+                stream=True
+            )
+            try:
+                body = read_streamed_body(response, max_response_bytes + 1, deadline)
+            finally:
+                response.close()
+        if len(body) > max_response_bytes:
+            raise CheckLimitExceeded(ERROR_OVERSIZE, f"Response body larger than {max_response_bytes} bytes")
 
-        response = requests.get(
-            anonymity_check_url,
-            proxies={"http": proxy, "https": proxy},
-            headers=headers,
-            timeout=10
-        )
+        return anonymity_from_judge(response.status_code, decode_body(body, response.encoding), original_ip)
+
+    except (requests.RequestException, CheckLimitExceeded) as e:
+        debug_print(f"Anonymity check exception: {str(e)}", "debug", print_lock)
+        return "Unknown", "Failed"
+    finally:
+        if own_session:
+            session.close()
 
-        if response.status_code != 200:
-            debug_print(f"Anonymity check failed with status code {response.status_code}", "debug", print_lock)
-            return "Unknown", "Failed"
+def decode_body(body, encoding=None):
+    """
+    Decodes a response body with its declared charset.
 
-        try:
-            data = response.json()
-        except json.JSONDecodeError:
-            debug_print(f"Anonymity check failed: Invalid JSON response", "debug", print_lock)
-            return "Unknown", "Failed"
-
-        proxy_ip = data.get("ip", data.get("origin", "Unknown"))
-        headers_info = data.get("headers", {})
-
-        # Convert header keys to case-insensitive dictionary
-        headers_info = {k.lower(): v for k, v in headers_info.items()}
-
-        # Log all headers in debug mode
-        for header, value in headers_info.items():
-            debug_print(f"Header: {header} = {value}", "debug", print_lock)
-
-        # Check for original IP in any header (transparent proxy)
-        for header, value in headers_info.items():
-            if original_ip in str(value):
-                debug_print(f"Transparent proxy detected - original IP leaked in {header} header", "debug", print_lock)
-                return proxy_ip, "Transparent"
-
-        # Check if proxy reveals itself via common headers
-        proxy_headers = ["via", "proxy-connection", "forwarded", "x-forwarded"]
-        reveals_proxy = False
-
-        for header in headers_info:
-            if any(ph in header.lower() for ph in proxy_headers):
-                reveals_proxy = True
-                debug_print(f"Proxy reveals itself via {header} header", "debug", print_lock)
-                break
+    Args:
+        body (bytes): Raw response body
+        encoding (str, optional): Charset from the Content-Type header
 
-        # Determine anonymity level
-        if proxy_ip != original_ip:
-            if not reveals_proxy:
-                # High anonymity: Different IP and no proxy headers
-                debug_print(f"High anonymous proxy detected: {proxy_ip}", "debug", print_lock)
-                return proxy_ip, "High Anonymous"
-            else:
-                # Regular anonymity: Different IP but proxy headers present
-                debug_print(f"Anonymous proxy with header leak detected: {proxy_ip}", "debug", print_lock)
-                return proxy_ip, "Anonymous (Header leak)"
-        else:
-            # Transparent: Same IP
-            debug_print(f"Transparent proxy detected: {proxy_ip}", "debug", print_lock)
-            return proxy_ip, "Transparent"
+    Returns:
+        str: Decoded body; unknown charsets fall back to UTF-8
+    """
+    try:
+        codecs.lookup(encoding or "utf-8")
+    except LookupError:
+        debug_print(f"Unknown response charset {encoding!r}, decoding as UTF-8", "debug", print_lock)
+        encoding = None
+    return body.decode(encoding or "utf-8", "replace")
 
-    except requests.RequestException as e:
-        debug_print(f"Anonymity check exception: {str(e)}", "debug", print_lock)
+def anonymity_from_judge(status_code, body, original_ip):
+    """
+    Evaluates a raw response of the anonymity judge.
+
+    Args:
+        status_code (int): HTTP status code of the judge response
+        body (str): Response body (JSON)
+        original_ip (str): Original IP address for comparison
+
+    Returns:
+        tuple: (detected_ip, anonymity_level)
+    """
+    if status_code != 200:
+        debug_print(f"Anonymity check failed with status code {status_code}", "debug", print_lock)
+        return "Unknown", "Failed"
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        debug_print(f"Anonymity check failed: Invalid JSON response", "debug", print_lock)
         return "Unknown", "Failed"
 
-def create_socket_connection(proxy_type, proxy_host, proxy_port, target_host, target_port, timeout):
+    return evaluate_anonymity(data, original_ip)
+
+def evaluate_anonymity(data, original_ip):
+    """
+    Evaluates the JSON echoed by the anonymity judge (IP + request headers).
+
+    Args:
+        data (dict): Decoded judge response (httpbin-style "origin"/"ip" and "headers")
+        original_ip (str): Original IP address for comparison
+
+    Returns:
+        tuple: (detected_ip, anonymity_level)
+    """
+    proxy_ip = data.get("ip", data.get("origin", "Unknown"))
+    headers_info = data.get("headers", {})
+
+    # Convert header keys to case-insensitive dictionary
+    headers_info = {k.lower(): v for k, v in headers_info.items()}
+
+    # Log all headers in debug mode
+    for header, value in headers_info.items():
+        debug_print(f"Header: {header} = {value}", "debug", print_lock)
+
+    # Check for original IP in any header (transparent proxy)
+    for header, value in headers_info.items():
+        if original_ip in str(value):
+            debug_print(f"Transparent proxy detected - original IP leaked in {header} header", "debug", print_lock)
+            return proxy_ip, "Transparent"
+
+    # Check if proxy reveals itself via common headers
+    proxy_headers = ["via", "proxy-connection", "forwarded", "x-forwarded"]
+    reveals_proxy = False
+
+    for header in headers_info:
+        if any(ph in header.lower() for ph in proxy_headers):
+            reveals_proxy = True
+            debug_print(f"Proxy reveals itself via {header} header", "debug", print_lock)
+            break
+
+    # Determine anonymity level
+    if proxy_ip != original_ip:
+        if not reveals_proxy:
+            # High anonymity: Different IP and no proxy headers
+            debug_print(f"High anonymous proxy detected: {proxy_ip}", "debug", print_lock)
+            return proxy_ip, "High Anonymous"
+        else:
+            # Regular anonymity: Different IP but proxy headers present
+            debug_print(f"Anonymous proxy with header leak detected: {proxy_ip}", "debug", print_lock)
+            return proxy_ip, "Anonymous (Header leak)"
+    else:
+        # Transparent: Same IP
+        debug_print(f"Transparent proxy detected: {proxy_ip}", "debug", print_lock)
+        return proxy_ip, "Transparent"
+
+def create_socket_connection(proxy_type, proxy_host, proxy_port, target_host, target_port, timeout, username=None, password=None):
     """
-    Create a SOCKS connection to test SOCKS4/SOCKS5 proxies.
+    Opens a tunnel to target_host:target_port through a proxy and closes it again.
+
+    SOCKS4/SOCKS5 proxies use their native handshake, HTTP proxies a CONNECT
+    request (PySocks' HTTP proxy type). HTTPS proxies get the CONNECT inside a
+    TLS connection, as requests/urllib3 2 speak to them, which PySocks cannot
+    do. No data is sent through the tunnel, which makes this the handshake-only
+    liveness test of --level 1.
 
     Args:
-        proxy_type (str): Type of proxy (socks4 or socks5)
+        proxy_type (str): Type of proxy (http, https, socks4 or socks5)
         proxy_host (str): Proxy host address
         proxy_port (int): Proxy port number
         target_host (str): Target host to connect to
         target_port (int): Target port to connect to
         timeout (int): Connection timeout in seconds
+        username (str, optional): Proxy username
+        password (str, optional): Proxy password
 
     Returns:
-        bool: True if connection was successful, False otherwise
+        bool: True once the tunnel is established
+
+    Raises:
+        OSError: The connection or handshake failed (PySocks errors are OSErrors)
+        ProxyProtocolError: The HTTPS proxy refused the tunnel
     """
     debug_print(f"Testing {proxy_type} connection to {proxy_host}:{proxy_port}", "debug", print_lock)
-    s = socks.socksocket()
-
-    if proxy_type.lower() == "socks4":
-        s.set_proxy(socks.SOCKS4, proxy_host, int(proxy_port))
-    elif proxy_type.lower() == "socks5":
-        s.set_proxy(socks.SOCKS5, proxy_host, int(proxy_port))
-    else:
-        debug_print(f"Unsupported proxy type: {proxy_type}", "debug", print_lock)
-        return False
+    if proxy_type.lower() == PROTOCOL_HTTPS:
+        s = socket.create_connection((proxy_host, int(proxy_port)), timeout)
+        try:
+            s = tls_client_context().wrap_socket(s, server_hostname=proxy_host)
+            s.sendall(connect_request(target_host, int(target_port), username, password))
+            reply = b""
+            while b"\r\n\r\n" not in reply:
+                chunk = s.recv(4096)
+                if not chunk or len(reply) > 16384:
+                    raise ProxyProtocolError("Invalid CONNECT response")
+                reply += chunk
+            check_connect_reply(reply)
+            debug_print(f"{proxy_type} connection successful", "debug", print_lock)
+            return True
+        except (OSError, ProxyProtocolError) as e:
+            debug_print(f"{proxy_type} connection failed: {str(e)}", "debug", print_lock)
+            raise
+        finally:
+            s.close()
+
+    socks_types = {
+        PROTOCOL_HTTP: socks.HTTP,
+        PROTOCOL_SOCKS4: socks.SOCKS4,
+        PROTOCOL_SOCKS5: socks.SOCKS5,
+    }
+    if proxy_type.lower() not in socks_types:
+        raise ProxyProtocolError(f"Unsupported proxy type: {proxy_type}")
 
+    s = socks.socksocket()
+    s.set_proxy(socks_types[proxy_type.lower()], proxy_host, int(proxy_port), username=username, password=password)
     s.settimeout(timeout)
 
     try:
         s.connect((target_host, int(target_port)))
-        s.close()
-        debug_print(f"SOCKS connection successful", "debug", print_lock)
+        debug_print(f"{proxy_type} connection successful", "debug", print_lock)
         return True
-    except Exception as e:
-        debug_print(f"SOCKS connection failed: {str(e)}", "debug", print_lock)
-        return False
+    except OSError as e:
+        debug_print(f"{proxy_type} connection failed: {str(e)}", "debug", print_lock)
+        raise
+    finally:
+        s.close()
 
 def reverse_dns_lookup(ip_address):
     """
     Performs a reverse DNS lookup for an IP address.
+    Uses caching to avoid repeated lookups for the same IP; concurrent
+    lookups of one IP share a single query.
 
     Args:
         ip_address (str): The IP address for reverse lookup
@@ -781,14 +1440,256 @@ def reverse_dns_lookup(ip_address):
     Returns:
         str: Hostname if successful, otherwise the original IP address
     """
+    def lookup():
+        try:
+            hostname, _, _ = socket.gethostbyaddr(ip_address)
+            return hostname, False
+        except (socket.herror, socket.gaierror, socket.timeout):
+            # If reverse lookup fails, return the IP (and remember the failure)
+            return ip_address, True
+        except Exception:
+            return ip_address, True
+
+    return rdns_cache.get_or_load(ip_address, lookup)
+
+def tcp_prefilter(proxies, timeout, max_parallel):
+    """
+    Cheap first stage: drops proxies whose host:port does not accept a TCP connection.
+
+    Non-blocking connects for up to max_parallel endpoints are multiplexed with
+    selectors (epoll/kqueue), so thousands of dead endpoints are discarded in
+    roughly one timeout instead of one full HTTP check each. Once the time
+    budget (--budget) is used up no further connects start; the endpoints not
+    probed by then are kept (and later skipped like any unchecked proxy).
+
+    Args:
+        proxies (list): Normalized proxies from validate_proxies
+        timeout (float): Connect timeout in seconds
+        max_parallel (int): Maximum number of simultaneous connection attempts
+
+    Returns:
+        list: Proxies whose endpoint is reachable, in input order
+    """
+    raise_open_file_limit(max_parallel + 256)
+    selector = selectors.DefaultSelector()
+    in_progress = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, getattr(errno, 'WSAEWOULDBLOCK', -1))
+    resolved = {}
+    reachable = set()
+    started = collections.deque()  # (deadline, sock) in start order == deadline order
+    pending = iter(proxies)
+    unprobed = set()
+    exhausted = False
+
+    def start(proxy):
+        """Starts a connection attempt; returns False if no file descriptor was left for it."""
+        parsed = urlparse(proxy)
+        endpoint = (parsed.hostname, parsed.port)
+        if endpoint not in resolved:
+            try:
+                family, _, _, _, address = socket.getaddrinfo(parsed.hostname, parsed.port, type=socket.SOCK_STREAM)[0]
+                resolved[endpoint] = (family, address)
+            except (OSError, IndexError):
+                resolved[endpoint] = None
+        if resolved[endpoint] is None:
+            return True
+        family, address = resolved[endpoint]
+        try:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+        except OSError as e:
+            # Out of descriptors: the caller retries later; anything else drops the endpoint
+            return e.errno not in (errno.EMFILE, errno.ENFILE)
+        try:
+            sock.setblocking(False)
+            result = sock.connect_ex(address)
+        except OSError:
+            result = None
+        if result not in in_progress:
+            sock.close()
+            return True
+        selector.register(sock, selectors.EVENT_WRITE, proxy)
+        started.append((time.monotonic() + budget_timeout(timeout), sock))
+        return True
+
+    def finish(sock):
+        selector.unregister(sock)
+        sock.close()
+
+    while True:
+        if not exhausted and budget_exhausted():
+            unprobed = set(pending)
+            exhausted = True
+            debug_print(f"Time budget used up during the pre-filter: {len(unprobed)} proxies not probed",
+                        "warning", print_lock)
+        while not exhausted and len(selector.get_map()) < max_parallel:
+            proxy = next(pending, None)
+            if proxy is None:
+                exhausted = True
+            elif not start(proxy) and selector.get_map():
+                # The hard open-file limit is below max_parallel: retry this proxy once
+                # attempts finish and stay at the number of descriptors actually available
+                pending = itertools.chain([proxy], pending)
+                max_parallel = len(selector.get_map())
+                debug_print(f"Pre-filter: out of file descriptors, limiting to {max_parallel} parallel connects",
+                            "warning", print_lock)
+                break
+
+        if not selector.get_map():
+            if exhausted:
+                break
+            continue
+
+        for key, _ in selector.select(timeout=0.1):
+            if key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                reachable.add(key.data)
+            finish(key.fileobj)
+
+        # Expire attempts that exceeded the timeout (already finished sockets are skipped)
+        now = time.monotonic()
+        while started and (started[0][0] <= now or started[0][1].fileno() == -1):
+            _, sock = started.popleft()
+            if sock.fileno() != -1:
+                finish(sock)
+
+    selector.close()
+    return [proxy for proxy in proxies if proxy in reachable or proxy in unprobed]
+
+# Protocol detection (--detect-protocol): SOCKS5 greeting (version 5, one method: no authentication)
+SOCKS5_GREETING = b"\x05\x01\x00"
+
+async def _probe_handshake(family, address, payload, reply_size, timeout):
+    """
+    Sends handshake bytes on a fresh TCP connection and reads the reply.
+
+    Args:
+        family (int): Address family of address
+        address (tuple): Resolved proxy address
+        payload (bytes): Handshake bytes to send
+        reply_size (int): Number of reply bytes to read
+        timeout (float): Timeout in seconds for each network operation
+
+    Returns:
+        bytes: Up to reply_size reply bytes (b"" if the endpoint refused, closed or timed out)
+    """
+    loop = asyncio.get_event_loop()
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    reply = b""
+    try:
+        await asyncio.wait_for(loop.sock_connect(sock, address), timeout)
+        await asyncio.wait_for(loop.sock_sendall(sock, payload), timeout)
+        while len(reply) < reply_size:
+            chunk = await asyncio.wait_for(loop.sock_recv(sock, reply_size - len(reply)), timeout)
+            if not chunk:
+                break
+            reply += chunk
+    except (OSError, asyncio.TimeoutError):
+        pass
+    finally:
+        sock.close()
+    return reply
+
+async def probe_protocols(host, port, target_host, target_port, timeout):
+    """
+    Detects the proxy protocols a bare host:port endpoint speaks.
+
+    The SOCKS5 greeting and a SOCKS4a CONNECT go out on two parallel
+    connections. HTTP proxies that answer the SOCKS5 greeting with an HTTP
+    error are identified from that reply; only if neither probe got an answer,
+    an HTTP CONNECT is sent on a third connection.
+
+    Args:
+        host (str): Proxy host
+        port (int): Proxy port
+        target_host (str): Target of the SOCKS4/CONNECT probes (host of the test URL)
+        target_port (int): Target port of the SOCKS4/CONNECT probes
+        timeout (float): Timeout in seconds for each network operation
+
+    Returns:
+        list: Detected protocols (socks5, socks4, http); empty if no handshake was answered
+    """
+    try:
+        family, _, _, _, address = await asyncio.wait_for(_resolve(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return []
+
+    socks4_request = (struct.pack(">BBH", 4, 1, target_port) + b"\x00\x00\x00\x01\x00"
+                      + target_host.encode("idna") + b"\x00")
+    socks5_reply, socks4_reply = await asyncio.gather(
+        _probe_handshake(family, address, SOCKS5_GREETING, 2, timeout),
+        _probe_handshake(family, address, socks4_request, 8, timeout)
+    )
+
+    protocols = []
+    if socks5_reply[:1] == b"\x05":
+        protocols.append(PROTOCOL_SOCKS5)
+    if len(socks4_reply) == 8 and socks4_reply[0] == 0 and 0x5A <= socks4_reply[1] <= 0x5D:
+        protocols.append(PROTOCOL_SOCKS4)
+    if protocols:
+        return protocols
+    if socks5_reply == b"HT":
+        return [PROTOCOL_HTTP]
+
+    connect_request = f"CONNECT {target_host}:{target_port} HTTP/1.1\r\nHost: {target_host}:{target_port}\r\n\r\n"
+    if await _probe_handshake(family, address, connect_request.encode("latin-1"), 5, timeout) == b"HTTP/":
+        return [PROTOCOL_HTTP]
+    return []
+
+def detect_protocols(proxies, timeout, max_parallel, test_url):
+    """
+    Replaces every bare host:port entry with one entry per detected protocol.
+
+    Endpoints are probed by up to max_parallel coroutines on one event loop.
+    Entries that already carry a protocol are passed through unchanged. Once
+    the time budget (--budget) is used up no further endpoints are probed.
+
+    Args:
+        proxies (list): Validated proxies, bare entries kept by validate_proxies(keep_bare=True)
+        timeout (float): Timeout in seconds for each probe
+        max_parallel (int): Maximum number of endpoints probed at once
+        test_url (str): Test URL; its host is the target of the SOCKS4/CONNECT probes
+
+    Returns:
+        tuple: (proxies with protocol, number of bare entries that answered no probe)
+    """
+    bare = [proxy for proxy in proxies if '://' not in proxy]
+    if not bare:
+        return proxies, 0
+
+    target = urlparse(test_url)
+    target_port = target.port or (443 if target.scheme.lower() == "https" else 80)
+    raise_open_file_limit(max_parallel * 3 + 256)
+    detected = {}
+
+    async def worker(pending):
+        # All workers share one iterator, so each endpoint is probed once
+        for entry in pending:
+            if budget_exhausted():
+                return
+            host, _, port = entry.rpartition(":")
+            detected[entry] = await probe_protocols(host, int(port), target.hostname, target_port,
+                                                    budget_timeout(timeout))
+
+    async def run():
+        pending = iter(bare)
+        await asyncio.gather(*(worker(pending) for _ in range(min(max_parallel, len(bare)))))
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
     try:
-        hostname, _, _ = socket.gethostbyaddr(ip_address)
-        return hostname
-    except (socket.herror, socket.gaierror, socket.timeout):
-        # If reverse lookup fails, return the IP
-        return ip_address
-    except Exception:
-        return ip_address
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+    tagged = []
+    for proxy in proxies:
+        if proxy in detected:
+            for protocol in detected[proxy]:
+                debug_print(f"Detected {protocol} on {proxy}", "debug", print_lock)
+                tagged.append(f"{protocol}://{proxy}")
+        else:
+            tagged.append(proxy)
+    undetected = sum(1 for protocols in detected.values() if not protocols)
+    return list(dict.fromkeys(tagged)), undetected
 
 def prepare_output_directory(config):
     """
@@ -923,7 +1824,11 @@ def save_as_sqlite(results, filename):
     CREATE TABLE IF NOT EXISTS proxies (
         proxy TEXT PRIMARY KEY,
         status TEXT,
+        error TEXT,
         response_time REAL,
+        connect_time REAL,
+        handshake_time REAL,
+        ttfb REAL,
         country TEXT,
         city TEXT,
         anonymity TEXT,
@@ -936,11 +1841,14 @@ def save_as_sqlite(results, filename):
     for result in results:
         try:
             cursor.execute(
-                "INSERT INTO proxies (proxy, status, response_time, country, city, anonymity, protocol) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                "INSERT INTO proxies (proxy, status, error, response_time, connect_time, handshake_time, ttfb, country, city, anonymity, protocol) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
                 (
                     result["proxy"],
                     result["status"],
+                    result.get("error", ""),
                     result["response_time"] if result["response_time"] != "N/A" else None,
+                    *(result.get(field) if result.get(field, "N/A") != "N/A" else None for field in TIMING_FIELDS),
                     result["country"],
                     result["city"],
                     result["anonymity"],
@@ -955,6 +1863,113 @@ def save_as_sqlite(results, filename):
     conn.close()
     debug_print(f"Results saved as SQLite database: {filename}", "success", print_lock)
 
+def load_history(filename):
+    """
+    Loads the outcomes of earlier runs from the history database.
+
+    Args:
+        filename (str): Path of the SQLite history file
+
+    Returns:
+        dict: Mapping of proxy string to (checks, successes, last_success, avg_response_time)
+    """
+    history = {}
+    if not os.path.exists(filename):
+        return history
+    try:
+        conn = sqlite3.connect(filename)
+        rows = conn.execute("SELECT proxy, checks, successes, last_success, avg_response_time FROM history").fetchall()
+        conn.close()
+    except sqlite3.Error as e:
+        debug_print(f"Could not read history {filename}: {str(e)}", "warning", print_lock)
+        return history
+    for proxy, checks, successes, last_success, avg_response_time in rows:
+        history[proxy] = (checks, successes, bool(last_success), avg_response_time)
+    return history
+
+def history_priority(entry):
+    """
+    Sort key of a proxy by its past outcomes: proxies that worked last time
+    come first (fastest first), then unknown ones, then proxies that failed
+    last time (best success rate first) and finally those that never worked.
+
+    Args:
+        entry (tuple): History entry from load_history(), or None if unknown
+
+    Returns:
+        tuple: Sort key
+    """
+    if entry is None:
+        return (1, 0)
+    checks, successes, last_success, avg_response_time = entry
+    if last_success:
+        return (0, avg_response_time if avg_response_time is not None else float('inf'))
+    if successes:
+        return (2, -successes / checks)
+    return (3, checks)
+
+def order_by_history(proxies, history):
+    """
+    Orders the proxies by their past outcomes; the sort is stable, so ties
+    keep their input order.
+
+    Args:
+        proxies (list): List of proxy strings
+        history (dict): History from load_history()
+
+    Returns:
+        tuple: (ordered proxy list, number of proxies that worked in their last run)
+    """
+    ordered = sorted(proxies, key=lambda proxy: history_priority(history.get(proxy)))
+    known_good = sum(1 for proxy in proxies if history.get(proxy, (0, 0, False, None))[2])
+    return ordered, known_good
+
+def update_history(filename, results):
+    """
+    Records the outcomes of this run in the history database.
+
+    Args:
+        filename (str): Path of the SQLite history file
+        results (list): List of proxy results
+
+    Returns:
+        None
+    """
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        conn = sqlite3.connect(filename)
+        cursor = conn.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS history (
+            proxy TEXT PRIMARY KEY,
+            checks INTEGER,
+            successes INTEGER,
+            last_success INTEGER,
+            avg_response_time REAL,
+            last_check TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        for result in results:
+            success = result["status"] != STATUS_FAILED
+            response_time = result["response_time"] if success and result["response_time"] != "N/A" else None
+            row = cursor.execute("SELECT checks, successes, avg_response_time FROM history WHERE proxy = ?",
+                                 (result["proxy"],)).fetchone()
+            checks, successes, avg_response_time = row if row else (0, 0, None)
+            if response_time is not None:
+                # Running average, so one lucky or slow check does not reorder the list
+                avg_response_time = response_time if avg_response_time is None else \
+                    HISTORY_LATENCY_WEIGHT * response_time + (1 - HISTORY_LATENCY_WEIGHT) * avg_response_time
+            cursor.execute(
+                "INSERT OR REPLACE INTO history (proxy, checks, successes, last_success, avg_response_time, last_check) "
+                "VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                (result["proxy"], checks + 1, successes + int(success), int(success), avg_response_time)
+            )
+        conn.commit()
+        conn.close()
+        debug_print(f"History updated with {len(results)} results: {filename}", "debug", print_lock)
+    except sqlite3.Error as e:
+        debug_print(f"Could not update history {filename}: {str(e)}", "warning", print_lock)
+
 def apply_filters(results, filter_status, filter_anonymity, filter_protocol, filter_country, filter_tld):
     """
     Applies all filters to the results list.
@@ -981,75 +1996,161 @@ def apply_filters(results, filter_status, filter_anonymity, filter_protocol, fil
 
     # Filter by anonymity
     if filter_anonymity:
-        anonymity_map = {
-            'highanonymous': ANONYMITY_HIGH,
-            'anonymous': ANONYMITY_ANONYMOUS,
-            'headerleak': ANONYMITY_HEADER_LEAK,
-            'transparent': ANONYMITY_TRANSPARENT
-        }
-        allowed_anonymity = [anonymity_map.get(a, a) for a in filter_anonymity]
+        allowed_anonymity = anonymity_levels_of(filter_anonymity)
         filtered = [r for r in filtered if r["anonymity"] in allowed_anonymity]
 
     # Filter by protocol
     if filter_protocol:
         filtered = [r for r in filtered if r["protocol"] in filter_protocol]
 
-    # Filter by country code
-    if filter_country:
-        # Convert country names to lowercase for comparison
-        filtered_by_country = []
-        for r in filtered:
-            country_name = r.get("country", "").lower()
-            # Check if country code is in COUNTRY_CODES or country name matches
-            country_code = COUNTRY_TO_CODE.get(country_name, "unknown")
-            if country_code in filter_country or country_name in filter_country:
-                filtered_by_country.append(r)
-        filtered = filtered_by_country
-
-    # Filter by TLD (same as country code for GeoIP-based filtering)
-    if filter_tld:
-        filtered_by_tld = []
-        for r in filtered:
-            country_name = r.get("country", "").lower()
-            country_code = COUNTRY_TO_CODE.get(country_name, "unknown")
-            if country_code in filter_tld:
-                filtered_by_tld.append(r)
-        filtered = filtered_by_tld
+    # Filter by country code and TLD (same as country code for GeoIP-based filtering)
+    if filter_country or filter_tld:
+        filtered = [r for r in filtered if country_matches(r.get("country", ""), filter_country, filter_tld)]
 
     return filtered
 
-def save_working_proxies_as_txt(results, filename):
+def anonymity_levels_of(filter_anonymity):
     """
-    Saves only working proxies as plain text file (one proxy per line).
+    Translates --filter-anonymity choices into anonymity levels.
 
     Args:
-        results (list): List of proxy results
-        filename (str): Complete file path
+        filter_anonymity (list): Desired anonymity choices (e.g. "highanonymous")
 
     Returns:
-        None
+        list: Matching anonymity levels as stored in the results
     """
-    working_proxies = [r["proxy"] for r in results if r["status"] != STATUS_FAILED]
-    if working_proxies:
-        with open(filename, "w") as f:
-            for proxy in working_proxies:
-                f.write(f"{proxy}\n")
-        debug_print(f"Working proxies saved as TXT: {filename}", "success", print_lock)
+    anonymity_map = {
+        'highanonymous': ANONYMITY_HIGH,
+        'anonymous': ANONYMITY_ANONYMOUS,
+        'headerleak': ANONYMITY_HEADER_LEAK,
+        'transparent': ANONYMITY_TRANSPARENT
+    }
+    return [anonymity_map.get(a, a) for a in filter_anonymity]
 
-def save_results(results, output_format, filters, config=None):
+def country_matches(country, filter_country, filter_tld):
     """
-    Saves filtered results in various formats.
+    Checks a GeoIP country name against the country and TLD filters.
 
     Args:
-        results (list): List of proxy results
-        output_format (str): Output format (json, csv, sqlite)
-        filters (dict): Dictionary with filter parameters (filter_status, filter_anonymity, etc.)
-        config (configparser.ConfigParser): Configuration
+        country (str): Country name from GeoIP
+        filter_country (list): Desired country codes or names (None = any)
+        filter_tld (list): Desired TLDs, i.e. country codes (None = any)
 
     Returns:
-        None
+        bool: True if the country passes both filters
     """
-    if not results:
+    # Convert country names to lowercase for comparison
+    country_name = country.lower()
+    country_code = COUNTRY_TO_CODE.get(country_name, "unknown")
+    if filter_country and country_code not in filter_country and country_name not in filter_country:
+        return False
+    return not filter_tld or country_code in filter_tld
+
+def filter_timeout_cap(filter_status):
+    """
+    Returns the longest response time that can still pass --filter-status.
+
+    Args:
+        filter_status (list): Desired speed categories (None = any)
+
+    Returns:
+        float: Timeout cap in seconds, or None if slow proxies are wanted too
+    """
+    if not filter_status:
+        return None
+    slowest = max(SPEED_THRESHOLDS[category][1] for category in filter_status)
+    return None if slowest == float('inf') else slowest / 1000
+
+def pushdown_protocol_filter(proxies, filter_protocol):
+    """
+    Drops proxies whose protocol --filter-protocol would discard, before they are checked.
+
+    Args:
+        proxies (list): List of proxy strings
+        filter_protocol (list): Desired protocols (None = any)
+
+    Returns:
+        list: Proxies that can pass the protocol filter
+    """
+    if not filter_protocol:
+        return proxies
+    return [proxy for proxy in proxies if urlparse(proxy).scheme.lower() in filter_protocol]
+
+def pushdown_country_filter(proxies, filter_country, filter_tld):
+    """
+    Drops proxies that the offline GeoIP database places outside --filter-country
+    and --filter-tld, before they are checked. Proxies the database does not
+    cover are kept while online lookups may still locate them after the check.
+
+    Args:
+        proxies (list): List of proxy strings
+        filter_country (list): Desired country codes or names (None = any)
+        filter_tld (list): Desired TLDs (None = any)
+
+    Returns:
+        list: Proxies that can pass the country filters
+    """
+    if geoip_offline is None or not (filter_country or filter_tld):
+        return proxies
+    kept = []
+    for proxy in proxies:
+        host = urlparse(proxy).hostname
+        located = geoip_offline.lookup(host) if host else None
+        if located is None and geoip_online:
+            kept.append(proxy)
+        elif country_matches(located[0] if located else "Unknown", filter_country, filter_tld):
+            kept.append(proxy)
+    return kept
+
+def needs_enrichment(timings, options):
+    """
+    Decides whether a working proxy gets the anonymity, GeoIP and rDNS lookups:
+    not below level 3, and not if its speed already fails --filter-status.
+
+    Args:
+        timings (dict): Phase times in ms from the connectivity test
+        options (dict): Check options with 'level', 'speed_basis' and 'filters'
+
+    Returns:
+        bool: True if the proxy should be enriched
+    """
+    if options.get('level', LEVEL_FULL) < LEVEL_FULL:
+        return False
+    filter_status = (options.get('filters') or {}).get('filter_status')
+    return not filter_status or speed_category_of(timings, options.get('speed_basis', SPEED_BASIS_TOTAL)) in filter_status
+
+def save_working_proxies_as_txt(results, filename):
+    """
+    Saves only working proxies as plain text file (one proxy per line).
+
+    Args:
+        results (list): List of proxy results
+        filename (str): Complete file path
+
+    Returns:
+        None
+    """
+    working_proxies = [r["proxy"] for r in results if r["status"] != STATUS_FAILED]
+    if working_proxies:
+        with open(filename, "w") as f:
+            for proxy in working_proxies:
+                f.write(f"{proxy}\n")
+        debug_print(f"Working proxies saved as TXT: {filename}", "success", print_lock)
+
+def save_results(results, output_format, filters, config=None):
+    """
+    Saves filtered results in various formats.
+
+    Args:
+        results (list): List of proxy results
+        output_format (str): Output format (json, csv, sqlite)
+        filters (dict): Dictionary with filter parameters (filter_status, filter_anonymity, etc.)
+        config (configparser.ConfigParser): Configuration
+
+    Returns:
+        None
+    """
+    if not results:
         debug_print("No results available to save.", "error", print_lock)
         return
 
@@ -1115,13 +2216,63 @@ def setup_argument_parser():
     parser.add_argument('url', nargs='?', help='URL to test')
     parser.add_argument('-p', '--proxy', type=str, help='Proxy or file with proxies (comma-separated or .txt file)')
     parser.add_argument('-t', '--timeout', type=int, help='Timeout in seconds (default from config)')
+    parser.add_argument('--first-pass', type=float, metavar='SECONDS',
+                        help='Check the whole list with this short timeout first; only proxies that timed out or hit the request deadline are checked again with -t (default: 0 = off)')
     parser.add_argument('-o', '--output', type=str, choices=["json", "csv", "sqlite"], help='Save results format')
     parser.add_argument('-v', '--version', action='store_true', help='Display version information and exit')
     parser.add_argument('-c', '--concurrent', type=int, help='Number of concurrent checks')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Tune the number of concurrent checks from live timeout/error rates (starts at -c, bounded by adaptive_min/adaptive_max)')
+    parser.add_argument('--adaptive-timeout', action='store_true',
+                        help='Derive the timeout from the response times of working proxies (timeout_percentile x timeout_factor, within timeout_min/timeout_max)')
+    parser.add_argument('--single-request', action='store_true',
+                        help='Measure speed and anonymity with one request to the anonymity judge (ignores the test URL)')
+    parser.add_argument('--level', type=int, choices=[LEVEL_TCP, LEVEL_HANDSHAKE, LEVEL_REQUEST, LEVEL_FULL],
+                        help='Check depth: 0 = TCP connect, 1 = proxy handshake, 2 = request, 3 = request plus anonymity/GeoIP/rDNS (default: 3)')
+    parser.add_argument('--retry', metavar='POLICY',
+                        help='Retries per failure class, e.g. "timeout:1,reset:1" (classes: timeout, refused, reset, local, ssl, proxy, other, deadline, oversize)')
+    parser.add_argument('--hedge', type=float, metavar='PCT',
+                        help='asyncio engine: start a second attempt once a test runs longer than the PCT percentile of working proxies (default: 0 = off)')
+    parser.add_argument('--max-bytes', type=int, metavar='N',
+                        help='Stop reading the test URL response after N bytes (default: 65536, 0 = headers only)')
+    parser.add_argument('--request-deadline', type=float, metavar='SECONDS',
+                        help='Hard wall-clock limit of every proxied request; slower ones fail as "deadline" (default: 0 = twice the timeout)')
+    parser.add_argument('--max-response', type=int, metavar='BYTES',
+                        help='Largest judge response read in full; larger ones fail as "oversize" (default: 1048576)')
+    parser.add_argument('--speed-basis', choices=[SPEED_BASIS_TOTAL, SPEED_BASIS_TTFB],
+                        help='Categorize speed by the full size-capped request or by time to first byte (default: total)')
+    parser.add_argument('--detect-protocol', action='store_true',
+                        help='Probe bare host:port entries for SOCKS5, SOCKS4 and HTTP instead of assuming http://')
+    parser.add_argument('--history', metavar='FILE',
+                        help='Keep past outcomes in the SQLite file FILE and check proxies that worked before first, fastest first')
+    parser.add_argument('--geoip-cache', metavar='FILE',
+                        help='Keep GeoIP results in the SQLite file FILE and reuse them in later runs')
+    parser.add_argument('--geoip-db', metavar='FILE',
+                        help='Look up countries in a local IP-range CSV (start,end,country[,city]) or .mmdb file first')
+    parser.add_argument('--no-online-geoip', action='store_true',
+                        help='With --geoip-db, do not ask the online GeoIP services about IPs the database does not cover')
+    parser.add_argument('--cache-size', type=int, metavar='N',
+                        help=f'Keep at most N entries each in the GeoIP and reverse DNS caches, least recently used are dropped (default: {DEFAULT_CACHE_SIZE}, 0 = unlimited)')
+    parser.add_argument('--prefilter', action='store_true',
+                        help='Drop proxies that refuse a plain TCP connect before the full check')
     parser.add_argument('-d', '--debug', action='store_true', help='Enable detailed debug output')
     parser.add_argument('-A', '--automatic-mode', action='store_true', help='Download proxy lists from configured URLs')
     parser.add_argument('-C', '--config', action='store_true', help='Create default config file in ~/.proxyreaper.conf')
     parser.add_argument('-l', '--reverse-lookup', action='store_true', help='Enable reverse DNS lookup for proxy IPs (slower)')
+    parser.add_argument('--engine', choices=[ENGINE_THREADS, ENGINE_ASYNCIO],
+                        help='Checking engine: one thread per check, or coroutines on one event loop (default from config: threads)')
+    parser.add_argument('--enrich-workers', type=int, metavar='N',
+                        help='Staged pipeline: -c workers only test connectivity, N separate workers run anonymity/GeoIP/rDNS for working proxies (default: 0 = off)')
+    parser.add_argument('--budget', type=float, metavar='MINUTES',
+                        help='Finish the run within MINUTES: stop starting checks near the deadline, shorten timeouts and save what was checked (default: 0 = no limit)')
+    parser.add_argument('--want', type=int, metavar='N',
+                        help='Stop as soon as N working proxies passing the --filter-* options are found and save them (default: 0 = check all)')
+    parser.add_argument('--max-per-host', type=int, metavar='N',
+                        help='At most N concurrent checks per proxy host (default: 0 = unlimited)')
+    parser.add_argument('--max-per-subnet', type=int, metavar='N',
+                        help='At most N concurrent checks per /24 (IPv4) or /48 (IPv6) network (default: 0 = unlimited)')
+    parser.add_argument('--processes', type=int, metavar='N',
+                        help='Split the checks across N worker processes, each running its own engine with -c checks (default: 1)')
 
     # Filter parameters
     parser.add_argument('--filter-status', nargs='+', choices=['ultrafast', 'fast', 'medium', 'slow'],
@@ -1152,10 +2303,44 @@ def extract_runtime_parameters(config, args):
     params = {
         'timeout': int(config.get('general', 'timeout')),
         'thread_count': int(config.get('general', 'concurrent')),
+        'engine': config.get('general', 'engine', fallback=ENGINE_THREADS),
+        'process_count': max(1, int(config.get('general', 'processes', fallback='1'))),
+        'enrich_workers': max(0, int(config.get('general', 'enrich_workers', fallback='0'))),
+        'max_per_host': max(0, int(config.get('general', 'max_per_host', fallback='0'))),
+        'max_per_subnet': max(0, int(config.get('general', 'max_per_subnet', fallback='0'))),
+        'budget': max(0.0, float(config.get('general', 'budget', fallback='0'))),
+        'want': max(0, int(config.get('general', 'want', fallback='0'))),
+        'first_pass_timeout': max(0.0, float(config.get('general', 'first_pass_timeout', fallback='0'))),
         'test_url': config.get('general', 'test_url') or "https://www.google.com",
+        'max_bytes': max(0, int(config.get('general', 'test_max_bytes', fallback=str(DEFAULT_TEST_MAX_BYTES)))),
+        'request_deadline': max(0.0, float(config.get('general', 'request_deadline', fallback='0'))),
+        'max_response_bytes': max(1, int(config.get('general', 'max_response_bytes', fallback=str(DEFAULT_MAX_RESPONSE_BYTES)))),
+        'speed_basis': config.get('general', 'speed_basis', fallback=SPEED_BASIS_TOTAL),
+        'level': min(LEVEL_FULL, max(LEVEL_TCP, int(config.get('general', 'level', fallback=str(LEVEL_FULL))))),
         'output_format': DEFAULT_OUTPUT_FORMAT,  # Default to CSV
         'anonymity_check_url': config.get('advanced', 'anonymity_check_url'),
         'reverse_lookup': False,
+        'prefilter': config.getboolean('advanced', 'prefilter', fallback=False),
+        'adaptive': config.getboolean('advanced', 'adaptive', fallback=False),
+        'adaptive_timeout': config.getboolean('advanced', 'adaptive_timeout', fallback=False),
+        'timeout_tuning': (float(config.get('advanced', 'timeout_percentile', fallback='99')),
+                           float(config.get('advanced', 'timeout_factor', fallback='1.5')),
+                           float(config.get('advanced', 'timeout_min', fallback='1')),
+                           float(config.get('advanced', 'timeout_max', fallback='30'))),
+        'single_request': config.getboolean('advanced', 'single_request', fallback=False),
+        'detect_protocol': config.getboolean('advanced', 'detect_protocol', fallback=False),
+        'retry_policy': parse_retry_policy(config.get('advanced', 'retry', fallback='')),
+        'hedge_percentile': float(config.get('advanced', 'hedge_percentile', fallback='0')),
+        'history_file': os.path.expanduser(config.get('advanced', 'history_file', fallback='')),
+        'geoip_cache_file': os.path.expanduser(config.get('advanced', 'geoip_cache_file', fallback='')),
+        'geoip_cache_ttl': (float(config.get('advanced', 'geoip_cache_ttl', fallback='720')),
+                            float(config.get('advanced', 'geoip_negative_ttl', fallback='6'))),
+        'geoip_database': os.path.expanduser(config.get('advanced', 'geoip_database', fallback='')),
+        'geoip_online': config.getboolean('advanced', 'geoip_online', fallback=True),
+        'cache_size': int(config.get('advanced', 'cache_size', fallback=str(DEFAULT_CACHE_SIZE))),
+        'adaptive_bounds': (int(config.get('advanced', 'adaptive_min', fallback='5')),
+                            int(config.get('advanced', 'adaptive_max', fallback='200'))),
+        'prefilter_concurrency': int(config.get('advanced', 'prefilter_concurrency', fallback='1000')),
         # Filter parameters
         'filter_status': None,
         'filter_anonymity': None,
@@ -1173,8 +2358,58 @@ def extract_runtime_parameters(config, args):
         params['thread_count'] = args.concurrent
     if args.output:
         params['output_format'] = args.output
+    if getattr(args, 'engine', None):
+        params['engine'] = args.engine
+    if getattr(args, 'processes', None):
+        params['process_count'] = max(1, args.processes)
+    if getattr(args, 'enrich_workers', None) is not None:
+        params['enrich_workers'] = max(0, args.enrich_workers)
+    if getattr(args, 'max_per_host', None) is not None:
+        params['max_per_host'] = max(0, args.max_per_host)
+    if getattr(args, 'max_per_subnet', None) is not None:
+        params['max_per_subnet'] = max(0, args.max_per_subnet)
+    if getattr(args, 'budget', None) is not None:
+        params['budget'] = max(0.0, args.budget)
+    if getattr(args, 'want', None) is not None:
+        params['want'] = max(0, args.want)
+    if getattr(args, 'first_pass', None) is not None:
+        params['first_pass_timeout'] = max(0.0, args.first_pass)
+    if getattr(args, 'max_bytes', None) is not None:
+        params['max_bytes'] = max(0, args.max_bytes)
+    if getattr(args, 'request_deadline', None) is not None:
+        params['request_deadline'] = max(0.0, args.request_deadline)
+    if getattr(args, 'max_response', None) is not None:
+        params['max_response_bytes'] = max(1, args.max_response)
+    if getattr(args, 'speed_basis', None):
+        params['speed_basis'] = args.speed_basis
+    if getattr(args, 'level', None) is not None:
+        params['level'] = args.level
+    if getattr(args, 'retry', None) is not None:
+        params['retry_policy'] = parse_retry_policy(args.retry)
+    if getattr(args, 'hedge', None) is not None:
+        params['hedge_percentile'] = args.hedge
+    if getattr(args, 'history', None):
+        params['history_file'] = os.path.expanduser(args.history)
+    if getattr(args, 'geoip_cache', None):
+        params['geoip_cache_file'] = os.path.expanduser(args.geoip_cache)
+    if getattr(args, 'geoip_db', None):
+        params['geoip_database'] = os.path.expanduser(args.geoip_db)
+    if getattr(args, 'no_online_geoip', False):
+        params['geoip_online'] = False
+    if getattr(args, 'cache_size', None) is not None:
+        params['cache_size'] = args.cache_size
     if hasattr(args, 'reverse_lookup') and args.reverse_lookup:
         params['reverse_lookup'] = True
+    if getattr(args, 'prefilter', False):
+        params['prefilter'] = True
+    if getattr(args, 'adaptive', False):
+        params['adaptive'] = True
+    if getattr(args, 'adaptive_timeout', False):
+        params['adaptive_timeout'] = True
+    if getattr(args, 'single_request', False):
+        params['single_request'] = True
+    if getattr(args, 'detect_protocol', False):
+        params['detect_protocol'] = True
 
     # Filter parameters
     if hasattr(args, 'filter_status') and args.filter_status:
@@ -1190,13 +2425,14 @@ def extract_runtime_parameters(config, args):
 
     return params
 
-def print_summary_statistics(results, total_proxies):
+def print_summary_statistics(results, total_proxies, run_info=None):
     """
     Calculates and prints a formatted summary of proxy test results.
 
     Args:
         results (list): List of all proxy results
         total_proxies (int): Total number of tested proxies
+        run_info (dict, optional): Additional "label: value" lines about the run
 
     Returns:
         None
@@ -1220,6 +2456,8 @@ def print_summary_statistics(results, total_proxies):
     debug_print(f"  - Medium (500-1000ms): {medium_proxies} ({(medium_proxies/total_proxies*100):.1f}%)", "info", print_lock)
     debug_print(f"  - Slow (>1000ms): {slow_proxies} ({(slow_proxies/total_proxies*100):.1f}%)", "info", print_lock)
     debug_print(f"High anonymous proxies: {high_anon} ({(high_anon/total_proxies*100):.1f}%)", "high_anonymous", print_lock)
+    for label, value in (run_info or {}).items():
+        debug_print(f"{label}: {value}", "info", print_lock)
     debug_print("─────────────────────────────", "info", print_lock)
 
 def categorize_speed(response_time_ms):
@@ -1241,6 +2479,20 @@ def categorize_speed(response_time_ms):
 
     return SPEED_SLOW  # Fallback for values over 1000ms
 
+def speed_category_of(timings, speed_basis=SPEED_BASIS_TOTAL):
+    """
+    Categorizes a working proxy by its total request time or by its time to first byte.
+
+    Args:
+        timings (dict): Phase times in ms from the connectivity test
+        speed_basis (str): "total" or "ttfb" (falls back to total without a TTFB)
+
+    Returns:
+        str: Speed category
+    """
+    use_ttfb = speed_basis == SPEED_BASIS_TTFB and timings.get("ttfb") is not None
+    return categorize_speed(timings["ttfb"] if use_ttfb else timings["total"])
+
 def signal_handler(sig, frame):
     """
     Handle interruption signals gracefully.
@@ -1264,242 +2516,2860 @@ def signal_handler(sig, frame):
     debug_print("Exiting gracefully.", "info", print_lock)
     sys.exit(0)
 
-def check_proxy_worker(proxy, test_url, timeout, public_ip, anonymity_check_url, progress_info, config, reverse_lookup=False):
+def next_progress(progress_info):
     """
-    Worker function to check a single proxy. Designed for ThreadPoolExecutor.
-
-    Connectivity is tested first; the expensive GeoIP, reverse-DNS and anonymity
-    lookups run only for proxies that actually work, so dead proxies fail fast.
+    Advances the shared progress counter and returns the progress indicator.
 
     Args:
-        proxy (str): Proxy to check
-        test_url (str): URL to test with
-        timeout (int): Timeout in seconds
-        public_ip (str): Original public IP
-        anonymity_check_url (str): URL for anonymity check
         progress_info (dict): Dictionary with progress information
-        config (configparser.ConfigParser): Loaded configuration (for autosave)
-        reverse_lookup (bool): Perform reverse DNS lookup for proxy IP
 
     Returns:
-        dict: Result of the proxy check
+        str: Progress indicator such as "[12/500]"
     """
-    global global_results, results_counter
-
-    # Update and get current progress
-    with print_lock:
-        progress_info['current'] += 1
-        current_index = progress_info['current']
-        total_proxies = progress_info['total']
-
-    # Progress indicator
-    progress = f"[{current_index}/{total_proxies}]"
-
-    # Parse and detect proxy protocol
-    parsed = urlparse(proxy)
-    protocol = parsed.scheme.lower()
-    host = parsed.hostname
-
-    # Step 1: connectivity + speed test FIRST. requests routes http/https and
-    # socks4/socks5 (via PySocks) through the proxy, so every protocol is
-    # measured by a real request to test_url and stays directly comparable.
-    proxy_dict = {"http": proxy, "https": proxy}
-    try:
-        start_time = time.time()
-        response = requests.get(test_url, proxies=proxy_dict, timeout=timeout)
-        elapsed_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-        success = response.ok  # any 2xx/3xx, not just 200
-        connection_details = f"HTTP {response.status_code}"
-    except requests.RequestException as e:
-        success = False
-        elapsed_time = "N/A"
-        connection_details = f"Error: {type(e).__name__}"
-
-    # Step 2: enrich only working proxies with geo, reverse-DNS and anonymity.
-    if success:
-        country, city = get_geoip_info(host)
-        hostname = reverse_dns_lookup(host) if reverse_lookup else host
-        _, anonymity = check_anonymity(proxy, anonymity_check_url, public_ip)
+    shared = progress_info.get('shared')
+    if shared is not None:
+        # Counter shared by all --processes workers
+        with shared.get_lock():
+            shared.value += 1
+            current_index = shared.value
+    else:
+        with print_lock:
+            progress_info['current'] += 1
+            current_index = progress_info['current']
+    return f"[{current_index}/{progress_info['total']}]"
 
-        speed_category = categorize_speed(elapsed_time)
-        speed_display = speed_category.upper()
-        color = "success" if speed_category in (SPEED_ULTRAFAST, SPEED_FAST) else "warning"
+def build_result(proxy, hostname, status, speed_category, elapsed_time, country, city, anonymity, protocol, timings=None, error=""):
+    """
+    Builds the result record written to all output formats.
 
-        display_host = hostname if reverse_lookup else proxy
-        debug_print(f"{progress} {speed_display} - {display_host} ({country}, {city}, {anonymity}) - {elapsed_time:.0f} ms", color, print_lock)
-        status = "working"
-    else:
-        country, city, anonymity = "Unknown", "Unknown", ANONYMITY_FAILED
-        hostname = host
-        speed_category = categorize_speed(None)
-        status = STATUS_FAILED
-        elapsed_time = "N/A"
-        # Detailed error info only in debug mode
-        if global_args and global_args.debug:
-            debug_print(f"{progress} FAILED - {proxy} - {connection_details}", "error", print_lock)
-        else:
-            debug_print(f"{progress} FAILED - {proxy}", "error", print_lock)
+    Phases that were not measured (failed proxies, or connect/handshake on the
+    threaded engine) are reported as "N/A". For failed proxies `error` holds the
+    failure class (e.g. "timeout", "deadline") or the HTTP status.
 
-    # Prepare the result
+    Returns:
+        dict: Result of the proxy check
+    """
+    timings = timings or {}
     result = {
         "proxy": proxy,
         "hostname": hostname,
         "status": status,
+        "error": error,
         "speed_category": speed_category,
         "response_time": elapsed_time if elapsed_time != "N/A" else "N/A",
+    }
+    for field in TIMING_FIELDS:
+        value = timings.get(field)
+        result[field] = value if value is not None else "N/A"
+    result.update({
         "country": country,
         "city": city,
         "anonymity": anonymity,
         "protocol": protocol,
         "check_time": time.strftime("%Y-%m-%d %H:%M:%S")
-    }
+    })
+    return result
+
+def report_result(progress, result, connection_details, reverse_lookup=False):
+    """
+    Prints the colored per-proxy progress line for a finished check.
+
+    Args:
+        progress (str): Progress indicator
+        result (dict): Result of the proxy check
+        connection_details (str): Status code or error name of the connectivity test
+        reverse_lookup (bool): Show the reverse-DNS hostname instead of the proxy
+
+    Returns:
+        None
+    """
+    proxy = result["proxy"]
+    if result["status"] != STATUS_FAILED:
+        speed_category = result["speed_category"]
+        color = "success" if speed_category in (SPEED_ULTRAFAST, SPEED_FAST) else "warning"
+        display_host = result["hostname"] if reverse_lookup else proxy
+        ttfb = f" (TTFB {result['ttfb']:.0f} ms)" if result["ttfb"] != "N/A" else ""
+        debug_print(f"{progress} {speed_category.upper()} - {display_host} ({result['country']}, {result['city']}, {result['anonymity']}) - {result['response_time']:.0f} ms{ttfb}", color, print_lock)
+    # Detailed error info only in debug mode
+    elif global_args and global_args.debug:
+        debug_print(f"{progress} FAILED - {proxy} - {connection_details}", "error", print_lock)
+    else:
+        debug_print(f"{progress} FAILED - {proxy}", "error", print_lock)
+
+def record_result(result, config):
+    """
+    Appends a result to global_results and triggers the periodic autosave.
+
+    Args:
+        result (dict): Result of the proxy check
+        config (configparser.ConfigParser): Loaded configuration (for autosave)
+
+    Returns:
+        None
+    """
+    global results_counter, want_found
+
+    if result_queue is not None:
+        result_queue.put(("result", result))
+        return
 
     # Append under the lock, but snapshot and write to disk OUTSIDE the lock so a
     # growing JSON dump every N proxies doesn't stall all other workers.
     snapshot = None
     with print_lock:
+        if early_stop.is_set():
+            return  # --want is satisfied and the results are being saved
         global_results.append(result)
         results_counter += 1
+        if want_filters is not None and apply_filters([result], **want_filters):
+            want_found += 1
+            if want_found >= want_target:
+                early_stop.set()
+                # Running threaded checks would only end at their timeout: cut their connections
+                request_watchdog.abort_all()
         if results_counter % AUTOSAVE_FREQUENCY == 0:
             snapshot = list(global_results)
     if snapshot is not None:
         autosave_results(snapshot, config)
 
-    return result
+def _exception_chain(exc):
+    """
+    Yields an exception and everything it wraps (cause, context, urllib3 reason,
+    PySocks socket_err and exception arguments).
+    """
+    seen = set()
+    stack = [exc]
+    while stack:
+        current = stack.pop()
+        if not isinstance(current, BaseException) or id(current) in seen:
+            continue
+        seen.add(id(current))
+        yield current
+        stack.extend([current.__cause__, current.__context__,
+                      getattr(current, 'reason', None), getattr(current, 'socket_err', None)])
+        stack.extend(getattr(current, 'args', ()))
 
-def main():
+class CheckLimitExceeded(Exception):
+    """A proxied request ran past its wall-clock deadline or returned too large a body."""
+
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind  # ERROR_DEADLINE or ERROR_OVERSIZE
+
+def capped_timeouts(timeout, timeout_cap, speed_basis):
     """
-    Main entry point of the script.
+    Applies the --filter-status timeout cap to one request.
+
+    Only what the speed category is based on is capped: each connect and read
+    for --speed-basis total, the time to first byte for ttfb (the body may
+    still take the full timeout). The request deadline keeps following the
+    full timeout.
+
+    Args:
+        timeout (float): Full per-operation timeout in seconds
+        timeout_cap (float): Longest response time that can pass --filter-status, or None
+        speed_basis (str): SPEED_BASIS_TOTAL or SPEED_BASIS_TTFB
+
+    Returns:
+        tuple: (per-operation timeout, first-byte limit in seconds or None)
     """
-    global global_args, global_results
+    if timeout_cap is None:
+        return timeout, None
+    if speed_basis == SPEED_BASIS_TTFB:
+        return timeout, timeout_cap
+    return min(timeout, timeout_cap), None
 
-    # Register signal handler for graceful exit
-    signal.signal(signal.SIGINT, signal_handler)
+def request_time_limit(timeout):
+    """
+    Wall-clock limit of one proxied request.
 
-    # clear screen
-    clear_screen()
+    Args:
+        timeout (float): Per-operation timeout of the request in seconds
 
-    # Always display the banner at startup
-    display_banner()
-    print("\n")  # Add 2 lines of spacing
+    Returns:
+        float: --request-deadline, or twice the timeout if that is not set,
+            cut to the time left until the run deadline (--budget)
+    """
+    limit = request_deadline or 2 * timeout
+    if run_deadline is None:
+        return limit
+    return min(limit, max(BUDGET_MIN_TIMEOUT, run_deadline - time.time()))
 
-    # Load configuration
-    config = load_config()
+def read_streamed_body(response, limit, deadline):
+    """
+    Reads up to `limit` bytes of a streamed requests response before `deadline`.
 
-    # Parse command line arguments
-    parser = setup_argument_parser()
+    read1() returns whatever a single socket read delivers, so a proxy dripping
+    a byte every few seconds runs into the deadline instead of holding the
+    thread until a full chunk has arrived.
 
-    # If no arguments provided, show help
-    if len(sys.argv) == 1:
-        parser.print_help()
-        sys.exit(0)
+    Args:
+        response (requests.Response): Response opened with stream=True
+        limit (int): Maximum number of body bytes to read
+        deadline (float): time.monotonic() by which the body must be read
 
-    args = parser.parse_args()
-    global_args = args  # Make args globally accessible
+    Returns:
+        bytes: Body (at most limit bytes, decoded like iter_content())
 
-    # Create default config if requested
-    if args.config:
-        user_config = os.path.expanduser('~/.proxyreaper.conf')
-        if create_default_config(user_config):
-            debug_print(f"Created default configuration file at {user_config}", "success")
-        else:
-            debug_print(f"Failed to create configuration file", "error")
-        sys.exit(0)
+    Raises:
+        CheckLimitExceeded: The deadline passed first
+    """
+    raw = response.raw
+    read = getattr(raw, "read1", None) or raw.read  # read1() needs urllib3 2
+    body = bytearray()
+    while len(body) < limit:
+        if time.monotonic() > deadline:
+            raise CheckLimitExceeded(ERROR_DEADLINE, "Deadline exceeded while reading the body")
+        # Raw reads raise urllib3's exceptions; map them like iter_content() does
+        try:
+            chunk = read(min(8192, limit - len(body)), decode_content=True)
+        except urllib3.exceptions.ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e) from e
+        except urllib3.exceptions.DecodeError as e:
+            raise requests.exceptions.ContentDecodingError(e) from e
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise requests.exceptions.ConnectionError(e) from e
+        if not chunk:
+            break
+        body += chunk
+    return bytes(body[:limit])
+
+class WatchedPoolMixin:
+    """Connection pool that hands its connections to the calling thread's watched request."""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        entry = getattr(watched_request, 'entry', None)
+        if entry is not None:
+            entry['connections'].append(conn)
+        return conn
+
+class WatchedConnectionMixin:
+    """
+    Connection that gives up right after connecting if its watched request was
+    aborted meanwhile (the watchdog cannot reach a socket that is still connecting).
+
+    It also records the phase timestamps of its watched request, like the marks
+    of the asyncio engine: "connected" after the TCP connect to the proxy and
+    "handshaken" once the CONNECT tunnel and the TLS handshake to the target
+    are done. PySocks connects and negotiates in one call, so SOCKS
+    connections get no "connected" mark.
+    """
 
-    # Show version and exit if requested
-    if args.version:
-        sys.exit(0)
+    def _new_conn(self):
+        sock = super()._new_conn()
+        entry = getattr(watched_request, 'entry', None)
+        if entry is not None and not hasattr(self, '_socks_options'):
+            entry['marks']['connected'] = time.time()
+        return sock
+
+    def connect(self):
+        super().connect()
+        entry = getattr(watched_request, 'entry', None)
+        if entry is None:
+            return
+        if entry['expired']:
+            self.close()
+            raise CheckLimitExceeded(ERROR_DEADLINE, "Deadline exceeded, connection closed")
+        # TLS to a forwarding https:// proxy is not a handshake with the target
+        if self._tunnel_host is not None or (isinstance(self, urllib3.connection.HTTPSConnection)
+                                             and not getattr(self, 'proxy_is_forwarding', False)):
+            entry['marks']['handshaken'] = time.time()
+
+def watched_class(cls, mixin):
+    """Returns the subclass of a urllib3 pool or connection class with mixin applied (created once per class)."""
+    watched = watched_classes.get(cls)
+    if watched is None:
+        attributes = {}
+        if mixin is WatchedPoolMixin:
+            attributes['ConnectionCls'] = watched_class(cls.ConnectionCls, WatchedConnectionMixin)
+        watched = watched_classes[cls] = type(f"Watched{cls.__name__}", (mixin, cls), attributes)
+    return watched
+
+class WatchedAdapter(requests.adapters.HTTPAdapter):
+    """
+    HTTPAdapter whose pools (direct, HTTP proxy and SOCKS proxy) report the
+    connections they hand out, so RequestWatchdog can shut them down.
+    """
 
-    # Override config with command line arguments
-    config = override_config_with_args(config, args)
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.watch_manager(self.poolmanager)
 
-    # Extract all runtime parameters
-    params = extract_runtime_parameters(config, args)
-    timeout = params['timeout']
-    thread_count = params['thread_count']
-    test_url = params['test_url']
-    output_format = params['output_format']
-    anonymity_check_url = params['anonymity_check_url']
-    reverse_lookup = params['reverse_lookup']
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        self.watch_manager(manager)
+        return manager
 
-    # Extract filter parameters
-    filters = {
-        'filter_status': params['filter_status'],
-        'filter_anonymity': params['filter_anonymity'],
-        'filter_protocol': params['filter_protocol'],
-        'filter_country': params['filter_country'],
-        'filter_tld': params['filter_tld']
-    }
+    @staticmethod
+    def watch_manager(manager):
+        # Instance attribute: only the pool managers of this adapter are affected
+        if not getattr(manager, 'watched', False):
+            manager.pool_classes_by_scheme = {scheme: watched_class(pool_cls, WatchedPoolMixin)
+                                              for scheme, pool_cls in manager.pool_classes_by_scheme.items()}
+            manager.watched = True
 
-    # Get the public IP address for anonymity checks
-    debug_print("Determining your public IP address...", "info", print_lock)
-    public_ip = get_public_ip()
-    debug_print(f"Your public IP: {public_ip}", "info", print_lock)
+def new_check_session():
+    """
+    Creates the per-proxy session of a threaded-engine check.
 
-    # Parse the proxies input
-    debug_print("Parsing proxies from input...", "info", print_lock)
-    if args.automatic_mode:
-        proxies = parse_proxies(args.proxy, auto_mode=True)
-    elif args.proxy:
-        proxies = parse_proxies(args.proxy)
-    else:
-        debug_print("Error: No proxy source specified. Use -p/--proxy or -A/--automatic-mode", "error", print_lock)
-        sys.exit(1)
+    Returns:
+        requests.Session: Session whose requests RequestWatchdog can abort
+    """
+    session = requests.Session()
+    adapter = WatchedAdapter()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
-    total_proxies = len(proxies)
+class RequestWatchdog:
+    """
+    Enforces the wall-clock deadline of threaded-engine requests.
+
+    requests' timeout only limits each socket operation, so a proxy dripping
+    header lines or body bytes never trips it. One background thread keeps
+    the deadlines of all watched requests in a heap and shuts down the sockets
+    of a request that runs past its deadline; the blocked read then fails at
+    once and guard() reports it as ERROR_DEADLINE. abort_all() does the same
+    for every watched request at once when --want is satisfied.
+    """
 
-    if total_proxies == 0:
-        debug_print("No valid proxies found. Exiting.", "error", print_lock)
-        sys.exit(1)
+    def __init__(self):
+        self.heap = []  # (deadline, sequence, entry); finished entries are dropped lazily
+        self.sequence = itertools.count()
+        self.cond = threading.Condition()
+        self.thread = None
+        self.aborted = False
+
+    @contextlib.contextmanager
+    def guard(self, deadline):
+        """
+        Watches the requests the calling thread sends through a new_check_session()
+        inside the block; raises CheckLimitExceeded(ERROR_DEADLINE) if they were aborted.
+        """
+        entry = {'connections': [], 'expired': False, 'done': False, 'deadline': deadline, 'marks': {}}
+        with self.cond:
+            if self.aborted:
+                raise CheckLimitExceeded(ERROR_DEADLINE, "Run stopped, request not sent")
+            heapq.heappush(self.heap, (deadline, next(self.sequence), entry))
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name="request-watchdog", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+        watched_request.entry = entry
+        try:
+            yield entry
+        except (requests.RequestException, OSError) as e:
+            if entry['expired']:
+                raise CheckLimitExceeded(ERROR_DEADLINE, "Deadline exceeded, connection closed") from e
+            raise
+        finally:
+            watched_request.entry = None
+            with self.cond:
+                entry['done'] = True
+        if entry['expired']:
+            # Aborted, but the read ended without an error (e.g. a body without length)
+            raise CheckLimitExceeded(ERROR_DEADLINE, "Deadline exceeded, connection closed")
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.heap:
+                    self.cond.wait()
+                deadline, _, entry = self.heap[0]
+                if entry['done'] or deadline != entry['deadline']:
+                    heapq.heappop(self.heap)  # finished, or postponed
+                    continue
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self.cond.wait(delay)
+                    continue
+                heapq.heappop(self.heap)
+                entry['expired'] = True
+                connections = list(entry['connections'])
+            self.shutdown(connections)
+
+    def postpone(self, entry, deadline):
+        """Moves the deadline of a request watched by guard(), whose context value is entry."""
+        with self.cond:
+            if not entry['expired']:
+                entry['deadline'] = deadline
+                heapq.heappush(self.heap, (deadline, next(self.sequence), entry))
+                self.cond.notify()
+
+    def abort_all(self):
+        """Aborts every watched request now; later ones fail as soon as they start."""
+        with self.cond:
+            self.aborted = True
+            connections = []
+            for _, _, entry in self.heap:
+                if not entry['done'] and not entry['expired']:
+                    entry['expired'] = True
+                    connections.extend(entry['connections'])
+            self.heap.clear()
+        self.shutdown(connections)
+
+    @staticmethod
+    def shutdown(connections):
+        """Shuts down the sockets of urllib3 connections, unblocking the threads reading from them."""
+        for conn in connections:
+            sock = getattr(conn, 'sock', None)
+            sock = getattr(sock, 'socket', sock)  # TLS-in-TLS transport wraps the real socket
+            if isinstance(sock, socket.socket):
+                try:
+                    # The plain socket's shutdown() also unblocks a TLS read in the other thread
+                    socket.socket.shutdown(sock, socket.SHUT_RDWR)
+                except OSError:
+                    pass
 
-    debug_print(f"Testing {total_proxies} proxies with a timeout of {timeout} seconds", "info", print_lock)
-    if global_args.debug:
-        debug_print("Debug mode enabled - showing detailed information", "debug", print_lock)
+# Shared by all threads; its thread starts with the first watched request
+request_watchdog = RequestWatchdog()
 
-    # Initialize progress tracking
-    progress_info = {
-        'current': 0,
-        'total': total_proxies
-    }
+def classify_error(exc):
+    """
+    Maps an exception raised by a proxy check to a coarse failure class.
 
-    # Use ThreadPoolExecutor for improved parallelization
-    debug_print(f"Starting proxy checks with {thread_count} concurrent workers", "info", print_lock)
-    with ThreadPoolExecutor(max_workers=thread_count) as executor:
-        # Submit all proxy checks to the executor
-        future_to_proxy = {
-            executor.submit(
-                check_proxy_worker,
-                proxy,
-                test_url,
-                timeout,
-                public_ip,
-                anonymity_check_url,
-                progress_info,
-                config,
-                reverse_lookup
-            ): proxy for proxy in proxies
-        }
+    Works for requests/urllib3/PySocks exceptions (by walking the wrapped
+    exceptions) as well as the plain OSErrors of the asyncio engine.
 
-        # As each future completes
-        for future in concurrent.futures.as_completed(future_to_proxy):
-            try:
-                # Retrieve the result (but we already saved it in the worker)
-                future.result()
-            except Exception as e:
-                if global_args.debug:
-                    debug_print(f"Error processing proxy: {str(e)}", "error", print_lock)
+    Args:
+        exc (BaseException): Exception raised by the connectivity test
 
-    # Save final results
-    debug_print("\nAll proxy checks completed!", "success", print_lock)
-    if output_format:
-        debug_print("Saving final results...", "info", print_lock)
-        save_results(global_results, output_format, filters, config)
+    Returns:
+        str: One of the ERROR_* constants
+    """
+    chain = list(_exception_chain(exc))
+    for e in chain:
+        if isinstance(e, CheckLimitExceeded):
+            return e.kind
+    if any(isinstance(e, OSError) and e.errno in LOCAL_SOCKET_ERRNOS for e in chain):
+        return ERROR_LOCAL
+    if any(isinstance(e, (requests.Timeout, socket.timeout, asyncio.TimeoutError)) for e in chain):
+        return ERROR_TIMEOUT
+    if any(isinstance(e, ConnectionRefusedError) or getattr(e, 'errno', None) == errno.ECONNREFUSED for e in chain):
+        return ERROR_REFUSED
+    if any(isinstance(e, (ConnectionResetError, ConnectionAbortedError, BrokenPipeError,
+                          asyncio.IncompleteReadError, http.client.RemoteDisconnected)) for e in chain):
+        return ERROR_RESET
+    if any(isinstance(e, ssl.SSLError) for e in chain):
+        return ERROR_SSL
+    if any(isinstance(e, (ProxyProtocolError, requests.exceptions.ProxyError, socks.ProxyError)) for e in chain):
+        return ERROR_PROXY
+    return ERROR_OTHER
+
+class ConcurrencyController:
+    """
+    AIMD controller for the number of checks in flight.
 
-    # Save final autosave
-    autosave_results(global_results, config, in_progress=False)
+    Every `interval` seconds the outcomes recorded since the last adjustment are
+    compared with the best interval seen so far. Local socket errors, a clearly
+    higher timeout rate or a doubled median latency of working proxies mean our
+    own uplink is saturated, and the limit is cut multiplicatively; otherwise it
+    grows by `step`.
+    """
+
+    def __init__(self, initial, minimum, maximum, step=ADAPTIVE_STEP, interval=ADAPTIVE_INTERVAL):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.step = max(1, step)
+        self.interval = interval
+        self.lowest = self.highest = self.limit
+        self.best_timeout_rate = None
+        self.best_latency = None
+        self.lock = threading.Lock()
+        self._reset_interval()
+
+    def _reset_interval(self):
+        self.interval_start = time.monotonic()
+        self.completed = 0
+        self.timeouts = 0
+        self.local_errors = 0
+        self.latencies = []
+
+    def record(self, success, elapsed_ms, error_kind=None):
+        """Records the outcome of one connectivity test."""
+        with self.lock:
+            self.completed += 1
+            if success:
+                self.latencies.append(elapsed_ms)
+            elif error_kind == ERROR_TIMEOUT:
+                self.timeouts += 1
+            elif error_kind == ERROR_LOCAL:
+                self.local_errors += 1
+
+            if (time.monotonic() - self.interval_start >= self.interval
+                    and self.completed >= ADAPTIVE_MIN_SAMPLES):
+                self._adjust()
+
+    def _adjust(self):
+        timeout_rate = self.timeouts / self.completed
+        latency = sorted(self.latencies)[len(self.latencies) // 2] if self.latencies else None
+
+        congested = self.local_errors > 0
+        if self.best_timeout_rate is not None and timeout_rate > self.best_timeout_rate + ADAPTIVE_TIMEOUT_TOLERANCE:
+            congested = True
+        if latency is not None and self.best_latency is not None and latency > self.best_latency * 2:
+            congested = True
+
+        previous = self.limit
+        if congested:
+            self.limit = max(self.minimum, int(self.limit * ADAPTIVE_DECREASE))
+        else:
+            self.limit = min(self.maximum, self.limit + self.step)
+            self.best_timeout_rate = timeout_rate if self.best_timeout_rate is None else min(self.best_timeout_rate, timeout_rate)
+            if latency is not None:
+                self.best_latency = latency if self.best_latency is None else min(self.best_latency, latency)
+
+        self.lowest = min(self.lowest, self.limit)
+        self.highest = max(self.highest, self.limit)
+        if self.limit != previous:
+            debug_print(f"Adaptive concurrency: {previous} -> {self.limit} (timeouts {timeout_rate:.0%}, "
+                        f"median latency {latency if latency is None else round(latency)} ms, local errors {self.local_errors})",
+                        "debug", print_lock)
+        self._reset_interval()
+
+    def describe(self):
+        """Returns a one-line description for the summary."""
+        return f"settled at {self.limit} (range {self.lowest}-{self.highest}, bounds {self.minimum}-{self.maximum})"
+
+class TimeoutTuner:
+    """
+    Derives the per-check timeout from the latency distribution of working checks.
+
+    Response times of working proxies are counted in a histogram with
+    log-spaced buckets, so memory and the percentile lookup stay constant no
+    matter how many proxies are checked. Once TIMEOUT_MIN_SAMPLES are in, the
+    timeout is the upper edge of the bucket holding the chosen percentile times
+    `factor`, clamped to [minimum, maximum]; before that the configured timeout
+    applies.
+    """
+
+    def __init__(self, percentile, factor, minimum, maximum):
+        self.percentile = min(100.0, max(0.0, percentile))
+        self.factor = factor
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.buckets = collections.Counter()  # bucket index -> working checks
+        self.count = 0
+        self.current = None  # seconds, None until enough samples are in
+        self.lowest = self.highest = None
+        self.lock = threading.Lock()
+
+    def record(self, elapsed_ms):
+        """Records the response time of one working check."""
+        index = int(math.log(max(elapsed_ms, 1.0)) / math.log(TIMEOUT_HISTOGRAM_GROWTH))
+        with self.lock:
+            self.buckets[index] += 1
+            self.count += 1
+            if self.count < TIMEOUT_MIN_SAMPLES:
+                return
+            rank = self.count * self.percentile / 100
+            seen = 0
+            for index in sorted(self.buckets):
+                seen += self.buckets[index]
+                if seen >= rank:
+                    break
+            upper_ms = TIMEOUT_HISTOGRAM_GROWTH ** (index + 1)
+            previous = self.current
+            self.current = min(self.maximum, max(self.minimum, upper_ms * self.factor / 1000))
+            self.lowest = self.current if self.lowest is None else min(self.lowest, self.current)
+            self.highest = self.current if self.highest is None else max(self.highest, self.current)
+        if previous is not None and abs(self.current - previous) >= 0.1 * previous:
+            debug_print(f"Adaptive timeout: {previous:.2f} s -> {self.current:.2f} s", "debug", print_lock)
+
+    def timeout(self, default):
+        """Returns the timeout for the next check (default until enough samples exist)."""
+        return default if self.current is None else self.current
+
+    def describe(self):
+        """Returns a one-line description for the summary."""
+        if self.current is None:
+            return f"not used ({self.count} working checks, {TIMEOUT_MIN_SAMPLES} needed)"
+        return (f"{self.current:.2f} s (p{self.percentile:g} x {self.factor:g} of {self.count} working checks, "
+                f"range {self.lowest:.2f}-{self.highest:.2f} s, bounds {self.minimum:g}-{self.maximum:g} s)")
+
+def current_limit(default):
+    """
+    Returns the number of checks that may be in flight right now.
+
+    Args:
+        default (int): Fixed concurrency used when the controller is disabled
+
+    Returns:
+        int: Current in-flight limit
+    """
+    return concurrency_controller.limit if concurrency_controller is not None else default
+
+def budget_timeout(timeout):
+    """
+    Shortens a network timeout so that it ends by the run deadline (--budget).
+
+    Args:
+        timeout (float): Configured timeout in seconds
+
+    Returns:
+        float: timeout, or the time left until the deadline if that is shorter
+    """
+    if run_deadline is None:
+        return timeout
+    return min(timeout, max(BUDGET_MIN_TIMEOUT, run_deadline - time.time()))
+
+def budget_exhausted():
+    """Returns True once too little of the time budget is left to start another check."""
+    return run_deadline is not None and run_deadline - time.time() < BUDGET_MIN_TIMEOUT
+
+def record_outcome(success, elapsed_time, error_kind):
+    """Feeds the result of a connectivity test to the adaptive controller and timeout (if enabled) and the hedging statistics."""
+    if concurrency_controller is not None:
+        concurrency_controller.record(success, elapsed_time, error_kind)
+    if success and elapsed_time != "N/A":
+        recent_latencies.append(elapsed_time)
+        if timeout_tuner is not None:
+            timeout_tuner.record(elapsed_time)
+
+def parse_retry_policy(text):
+    """
+    Parses a retry policy such as "timeout:1, reset:1, refused:0".
+
+    Args:
+        text (str): Comma-separated failure-class:retries pairs (empty = no retries)
+
+    Returns:
+        dict: Maximum number of retries per ERROR_* class
+    """
+    valid_kinds = (ERROR_TIMEOUT, ERROR_REFUSED, ERROR_RESET, ERROR_LOCAL, ERROR_SSL, ERROR_PROXY, ERROR_OTHER,
+                   ERROR_DEADLINE, ERROR_OVERSIZE)
+    policy = {}
+    for entry in filter(None, (part.strip() for part in (text or "").split(","))):
+        kind, _, retries = entry.partition(":")
+        kind = kind.strip().lower()
+        if kind not in valid_kinds or not retries.strip().isdigit():
+            debug_print(f"Ignoring invalid retry policy entry: {entry}", "warning", print_lock)
+            continue
+        policy[kind] = int(retries)
+    return policy
+
+def attempt_timeout(timeout, options, attempt):
+    """
+    Timeout of one attempt: the short first-pass timeout (--first-pass) for first
+    attempts, the full timeout for the second pass and retries. With
+    --adaptive-timeout the full timeout comes from the TimeoutTuner.
+
+    Args:
+        timeout (float): Configured full timeout in seconds
+        options (dict): Check options with 'first_pass_timeout'
+        attempt (int): Attempt number (0 = first)
+
+    Returns:
+        float: Timeout in seconds
+    """
+    if timeout_tuner is not None:
+        timeout = timeout_tuner.timeout(timeout)
+    first_pass = options.get('first_pass_timeout', 0)
+    if attempt == 0 and first_pass:
+        return min(timeout, first_pass)
+    return timeout
+
+def check_request_options(options, test_url, anonymity_check_url):
+    """
+    Request settings of the connectivity test, shared by all check paths.
+
+    In single-request mode (--single-request) the judge URL is fetched in full
+    and its response provides status, speed and anonymity; otherwise the test
+    URL is fetched up to --max-bytes.
+
+    Args:
+        options (dict): Check options with 'single_request', 'max_bytes' and 'speed_basis'
+        test_url (str): URL of the connectivity test
+        anonymity_check_url (str): URL of the anonymity judge
+
+    Returns:
+        tuple: (single_request, check_url, check_headers, max_bytes, speed_basis)
+    """
+    single_request = options.get('single_request', False)
+    check_url = anonymity_check_url if single_request else test_url
+    check_headers = ANONYMITY_CHECK_HEADERS if single_request else None
+    max_bytes = None if single_request else options.get('max_bytes', DEFAULT_TEST_MAX_BYTES)
+    speed_basis = options.get('speed_basis', SPEED_BASIS_TOTAL)
+    return single_request, check_url, check_headers, max_bytes, speed_basis
+
+def schedule_retry(proxy, success, error_kind, options, attempt, progress):
+    """
+    Queues a failed check for another attempt if the retry policy allows it.
+
+    Retries wait in retry_queue and are started only with slots that fresh
+    proxies leave free, so they never delay first attempts. With a first-pass
+    timeout every first attempt that timed out gets one retry with the full
+    timeout (the second pass); it counts as the first timeout retry. A first
+    attempt that ran into its wall-clock deadline gets the second pass too: that
+    deadline is derived from the short first-pass timeout, so a slow but valid
+    proxy hits it even though every single read was in time.
+
+    Args:
+        proxy (str): Checked proxy
+        success (bool): Outcome of the connectivity test
+        error_kind (str): ERROR_* class of the failure (None for HTTP error statuses)
+        options (dict): Check options with the parsed 'retry_policy'
+        attempt (int): Number of the attempt that just finished (0 = first)
+        progress (str): Progress indicator, kept for the retry
+
+    Returns:
+        bool: True if the proxy was queued again (its result is not final yet)
+    """
+    if success:
+        if attempt:
+            with retry_lock:
+                retry_stats['recovered'] += 1
+        return False
+    retries = options.get('retry_policy', {}).get(error_kind, 0)
+    second_pass = (attempt == 0 and error_kind in (ERROR_TIMEOUT, ERROR_DEADLINE)
+                   and options.get('first_pass_timeout', 0))
+    if second_pass:
+        retries = max(retries, 1)
+    if attempt >= retries or budget_exhausted():
+        return False
+    with retry_lock:
+        retry_stats['second_pass' if second_pass else 'retried'] += 1
+    retry_queue.append((proxy, attempt + 1, progress))
+    debug_print(f"Retrying {proxy} after {error_kind} (attempt {attempt + 2})", "debug", print_lock)
+    return True
+
+def hedge_delay(percentile):
+    """
+    Delay after which a hedged second attempt is started.
+
+    Args:
+        percentile (float): Percentile of recent working response times (0 = hedging off)
+
+    Returns:
+        float: Delay in seconds, or None while hedging is off or too few samples exist
+    """
+    if not percentile or len(recent_latencies) < HEDGE_MIN_SAMPLES:
+        return None
+    samples = sorted(recent_latencies)
+    return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))] / 1000
+
+def describe_retries(stats, options):
+    """
+    Summary line of the two-pass/retry/hedging policy, or None if none is enabled.
+
+    Args:
+        stats (dict): Counters like retry_stats (possibly summed over processes)
+        options (dict): Check options
+
+    Returns:
+        str: Description for the summary
+    """
+    parts = []
+    if options.get('first_pass_timeout'):
+        parts.append(f"{stats['second_pass']} timed out or hit the deadline in the first pass")
+    if options.get('retry_policy'):
+        parts.append(f"{stats['retried']} retried")
+    if options.get('retry_policy') or options.get('first_pass_timeout'):
+        parts.append(f"{stats['recovered']} recovered")
+    if options.get('hedge_percentile'):
+        parts.append(f"{stats['hedged']} hedged")
+    return ", ".join(parts) or None
+
+class StageMetrics:
+    """Queue-depth, wait-time and throughput counters of one pipeline stage."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.queued = 0
+        self.active = 0
+        self.max_queued = 0
+        self.processed = 0
+        self.total_wait = 0.0
+        self.lock = threading.Lock()
+
+    def enqueue(self):
+        """Registers a queued item; returns its enqueue timestamp."""
+        with self.lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        return time.monotonic()
+
+    def start(self, enqueued_at):
+        """Moves an item from the queue to a worker."""
+        with self.lock:
+            self.queued -= 1
+            self.active += 1
+            self.total_wait += time.monotonic() - enqueued_at
+
+    def finish(self):
+        """Marks an item as processed."""
+        with self.lock:
+            self.active -= 1
+            self.processed += 1
+
+    def describe(self):
+        """Returns a one-line description for the summary."""
+        average_wait = self.total_wait / self.processed * 1000 if self.processed else 0
+        return (f"{self.workers} workers, {self.processed} processed, "
+                f"max queue depth {self.max_queued}, avg queue wait {average_wait:.0f} ms")
+
+def report_pipeline_depth(force=False):
+    """
+    Prints the current queue depth of every pipeline stage (debug mode, throttled).
+
+    Args:
+        force (bool): Print even if the last report was less than PIPELINE_REPORT_INTERVAL ago
+
+    Returns:
+        None
+    """
+    global pipeline_last_report
+    if not pipeline_stages:
+        return
+    now = time.monotonic()
+    if not force and now - pipeline_last_report < PIPELINE_REPORT_INTERVAL:
+        return
+    pipeline_last_report = now
+    depths = ", ".join(f"{stage.name}: {stage.queued} queued / {stage.active} active" for stage in pipeline_stages.values())
+    debug_print(f"Pipeline depth - {depths}", "debug", print_lock)
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter for one destination host.
+
+    Callers reserve a token and sleep until it is due instead of failing, so
+    requests over the limit queue up in arrival order. Reservations work the
+    same for threads (throttle) and coroutines (throttle_async).
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self):
+        """Takes one token and returns the seconds to wait until it is available."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.requests += 1
+            if delay:
+                self.waits += 1
+                self.total_wait += delay
+                self.max_wait = max(self.max_wait, delay)
+            return delay
+
+    def stats(self):
+        """Returns the wait counters (mergeable across processes)."""
+        with self.lock:
+            return {"requests": self.requests, "waits": self.waits,
+                    "total_wait": self.total_wait, "max_wait": self.max_wait}
+
+def describe_rate_limit(stats):
+    """
+    Summary line of a rate limiter.
+
+    Args:
+        stats (dict): Counters from TokenBucket.stats() (possibly summed over processes)
+
+    Returns:
+        str: Description for the summary
+    """
+    return (f"{stats['requests']} requests, {stats['waits']} delayed, "
+            f"waited {stats['total_wait']:.1f} s in total (max {stats['max_wait']:.2f} s)")
+
+def load_rate_limiters(config, share=1):
+    """
+    Creates the token buckets of the [ratelimits] config section.
+
+    Each entry is "hostname = rate[/burst]" with rate in requests per second.
+
+    Args:
+        config (configparser.ConfigParser): Loaded configuration
+        share (int): Number of processes sharing the limit (each gets rate/share)
+
+    Returns:
+        dict: TokenBucket per hostname
+    """
+    limiters = {}
+    if not config.has_section('ratelimits'):
+        return limiters
+    for host, value in config.items('ratelimits'):
+        rate, _, burst = value.partition("/")
+        try:
+            rate, burst = float(rate) / share, float(burst or 1)
+        except ValueError:
+            debug_print(f"Ignoring invalid rate limit for {host}: {value}", "warning", print_lock)
+            continue
+        if rate <= 0:
+            debug_print(f"Ignoring invalid rate limit for {host}: {value}", "warning", print_lock)
+            continue
+        limiters[host.lower()] = TokenBucket(rate, burst)
+    return limiters
+
+def throttle(url):
+    """
+    Blocks until the rate limiter of url's host (if configured) admits a request.
+
+    Args:
+        url (str): URL about to be requested
+
+    Returns:
+        float: Seconds waited
+    """
+    limiter = rate_limiters.get((urlparse(url).hostname or "").lower())
+    delay = limiter.reserve() if limiter is not None else 0.0
+    if delay:
+        time.sleep(delay)
+    return delay
+
+async def throttle_async(url):
+    """Asyncio counterpart of throttle(); waits without blocking the event loop."""
+    limiter = rate_limiters.get((urlparse(url).hostname or "").lower())
+    delay = limiter.reserve() if limiter is not None else 0.0
+    if delay:
+        await asyncio.sleep(delay)
+    return delay
+
+def test_connectivity(proxy, url, timeout, session, headers=None, max_bytes=DEFAULT_TEST_MAX_BYTES,
+                      timeout_cap=None, speed_basis=SPEED_BASIS_TOTAL):
+    """
+    Connectivity + speed test: one streamed GET of url through the proxy.
+
+    requests routes http/https and socks4/socks5 (via PySocks) through the proxy,
+    so every protocol is measured by a real request and stays directly comparable.
+    The body is streamed and reading stops after max_bytes, so a large test page
+    neither counts the proxy's bandwidth as latency nor wastes transfer.
+
+    Besides the time to first byte (response headers received) and the total,
+    the connections of new_check_session() record the connect and CONNECT/TLS
+    phases (see WatchedConnectionMixin). Both are None when the request reused
+    a kept-alive connection, and the connect phase is None for SOCKS proxies.
+
+    requests' timeout only limits each socket operation, so the whole request
+    runs under RequestWatchdog: at the wall-clock limit of request_time_limit()
+    the connection is shut down, even while headers are still dripping in.
+
+    Args:
+        proxy (str): Proxy to check
+        url (str): URL to request (test_url, or the judge in single-request mode)
+        timeout (int): Timeout in seconds
+        session (requests.Session): Per-proxy session from new_check_session() (keeps the connection alive)
+        headers (dict, optional): Extra request headers
+        max_bytes (int): Stop reading the response body after this many bytes; None
+            reads the whole body, and one larger than --max-response fails the check
+        timeout_cap (float, optional): --filter-status cap, applied by capped_timeouts()
+        speed_basis (str): Speed basis the cap applies to
+
+    Returns:
+        tuple: (success, timings, connection_details, error_kind, response)
+               where timings holds the phase times in ms (None if the check failed)
+               and response is (status_code, headers, body) or None
+    """
+    proxy_dict = {"http": proxy, "https": proxy}
+    throttle(url)  # before the clock starts: queueing for the rate limit is not latency
+    timeout = budget_timeout(timeout)
+    request_timeout, first_byte_limit = capped_timeouts(timeout, timeout_cap, speed_basis)
+    limit = max_response_bytes + 1 if max_bytes is None else max_bytes
+    try:
+        start_time = time.time()
+        deadline = time.monotonic() + request_time_limit(timeout)
+        header_deadline = deadline if first_byte_limit is None else min(deadline, time.monotonic() + first_byte_limit)
+        with request_watchdog.guard(header_deadline) as watch:
+            response = session.get(url, proxies=proxy_dict, headers=headers, timeout=request_timeout, stream=True)
+            ttfb = (time.time() - start_time) * 1000  # Convert to milliseconds
+            if header_deadline != deadline:
+                request_watchdog.postpone(watch, deadline)
+            try:
+                body = read_streamed_body(response, limit, deadline)
+            except (CheckLimitExceeded, requests.RequestException):
+                response.close()
+                raise
+        if len(body) >= limit:
+            # Unread rest of the body: drop the connection instead of draining it
+            response.close()
+        if max_bytes is None and len(body) > max_response_bytes:
+            raise CheckLimitExceeded(ERROR_OVERSIZE, f"Response body larger than {max_response_bytes} bytes")
+        marks = watch['marks']
+        connected = marks.get("connected")
+        timings = {
+            "connect_time": (connected - start_time) * 1000 if connected else None,
+            "handshake_time": (marks["handshaken"] - connected) * 1000 if connected and "handshaken" in marks else None,
+            "ttfb": ttfb,
+            "total": (time.time() - start_time) * 1000,
+        }
+        success = response.ok  # any 2xx/3xx, not just 200
+        outcome = (success, timings, f"HTTP {response.status_code}", None,
+                   (response.status_code, response.headers, body))
+    except CheckLimitExceeded as e:
+        outcome = (False, None, f"Error: {e}", e.kind, None)
+    except requests.RequestException as e:
+        outcome = (False, None, f"Error: {type(e).__name__}", classify_error(e), None)
+    record_outcome(outcome[0], outcome[1]["total"] if outcome[1] else "N/A", outcome[3])
+    return outcome
+
+def test_liveness(proxy, test_url, timeout, handshake=False):
+    """
+    Liveness test of check levels 0 and 1: no HTTP request is sent.
+
+    Level 0 only opens a TCP connection to the proxy; level 1 also performs the
+    proxy handshake to the test URL's host via create_socket_connection().
+
+    Args:
+        proxy (str): Proxy to check
+        test_url (str): Test URL; its host and port are the handshake target
+        timeout (int): Timeout in seconds
+        handshake (bool): Perform the proxy handshake (level 1)
+
+    Returns:
+        tuple: Same shape as test_connectivity(); response is always None
+    """
+    parsed = urlparse(proxy)
+    timeout = budget_timeout(timeout)
+    try:
+        start_time = time.time()
+        if handshake:
+            target = urlparse(test_url)
+            target_port = target.port or (443 if target.scheme.lower() == "https" else 80)
+            create_socket_connection(parsed.scheme, parsed.hostname, parsed.port, target.hostname, target_port,
+                                     timeout, parsed.username, parsed.password)
+        else:
+            socket.create_connection((parsed.hostname, parsed.port), timeout).close()
+        elapsed_time = (time.time() - start_time) * 1000
+        # PySocks connects and handshakes in one call, so level 1 only has a total
+        timings = {"total": elapsed_time} if handshake else {"connect_time": elapsed_time, "total": elapsed_time}
+        outcome = (True, timings, "Handshake OK" if handshake else "TCP connect OK", None, None)
+    except (OSError, ProxyProtocolError) as e:
+        outcome = (False, None, f"Error: {type(e).__name__}", classify_error(e), None)
+    record_outcome(outcome[0], outcome[1]["total"] if outcome[1] else "N/A", outcome[3])
+    return outcome
+
+def unchecked_enrichment(proxy):
+    """
+    Enrichment placeholder for working proxies checked below level 3, or too slow for --filter-status.
+
+    Args:
+        proxy (str): Working proxy
+
+    Returns:
+        tuple: (hostname, country, city, anonymity) without any lookup
+    """
+    return urlparse(proxy).hostname, "Unknown", "Unknown", ANONYMITY_NOT_CHECKED
+
+def enrich_proxy(proxy, public_ip, anonymity_check_url, reverse_lookup, session, judge_response=None, filters=None):
+    """
+    Enrichment of a working proxy: anonymity (on the warm connection), GeoIP and reverse DNS.
+
+    Lookups whose result no longer matters are skipped: GeoIP once the anonymity
+    fails --filter-anonymity, reverse DNS once the country fails the country filters,
+    and every remaining lookup once the time budget (--budget) is used up.
+
+    Args:
+        proxy (str): Working proxy
+        public_ip (str): Original public IP
+        anonymity_check_url (str): URL for anonymity check
+        reverse_lookup (bool): Perform reverse DNS lookup for proxy IP
+        session (requests.Session): Per-proxy session, or None for a fresh connection
+        judge_response (tuple, optional): (status_code, headers, body) of a single-request check
+        filters (dict, optional): Active filters as passed to save_results()
+
+    Returns:
+        tuple: (hostname, country, city, anonymity)
+    """
+    filters = filters or {}
+    host = urlparse(proxy).hostname
+    if budget_exhausted():
+        if session is not None:
+            session.close()
+        return unchecked_enrichment(proxy)
+    if judge_response is not None:
+        status_code, response_headers, body = judge_response
+        text = decode_body(body, requests.utils.get_encoding_from_headers(response_headers))
+        _, anonymity = anonymity_from_judge(status_code, text, public_ip)
+    else:
+        _, anonymity = check_anonymity(proxy, anonymity_check_url, public_ip, session=session)
+    if session is not None:
+        session.close()
+    if budget_exhausted() or (filters.get('filter_anonymity')
+                              and anonymity not in anonymity_levels_of(filters['filter_anonymity'])):
+        return host, "Unknown", "Unknown", anonymity
+    country, city = get_geoip_info(host)
+    if budget_exhausted() or not country_matches(country, filters.get('filter_country'), filters.get('filter_tld')):
+        return host, country, city, anonymity
+    hostname = reverse_dns_lookup(host) if reverse_lookup else host
+    return hostname, country, city, anonymity
+
+def finish_check(proxy, progress, timings, connection_details, enrichment, config, reverse_lookup=False, speed_basis=SPEED_BASIS_TOTAL, error_kind=None):
+    """
+    Builds, prints and records the result of a check.
+
+    Args:
+        proxy (str): Checked proxy
+        progress (str): Progress indicator
+        timings (dict): Phase times in ms from the connectivity test (None for failed proxies)
+        connection_details (str): Status code or error name of the connectivity test
+        enrichment (tuple): (hostname, country, city, anonymity), or None if the proxy failed
+        config (configparser.ConfigParser): Loaded configuration (for autosave)
+        reverse_lookup (bool): Show the reverse-DNS hostname in the progress line
+        speed_basis (str): Categorize speed by the "total" request time or by "ttfb"
+        error_kind (str, optional): ERROR_* class of a failed connectivity test
+
+    Returns:
+        dict: Result of the proxy check
+    """
+    parsed = urlparse(proxy)
+    error = ""
+    if enrichment is not None:
+        hostname, country, city, anonymity = enrichment
+        elapsed_time = timings["total"]
+        speed_category = speed_category_of(timings, speed_basis)
+        status = "working"
+    else:
+        hostname = parsed.hostname
+        country, city, anonymity = "Unknown", "Unknown", ANONYMITY_FAILED
+        speed_category = categorize_speed(None)
+        status = STATUS_FAILED
+        elapsed_time = "N/A"
+        timings = None
+        error = error_kind or connection_details
+
+    result = build_result(proxy, hostname, status, speed_category, elapsed_time, country, city, anonymity,
+                          parsed.scheme.lower(), timings, error)
+    report_result(progress, result, connection_details, reverse_lookup)
+    record_result(result, config)
+    return result
+
+def check_proxy_worker(proxy, test_url, timeout, public_ip, anonymity_check_url, progress_info, config, reverse_lookup=False, options=None, attempt=0, progress=None):
+    """
+    Worker function to check a single proxy. Designed for ThreadPoolExecutor.
+
+    Connectivity is tested first; the expensive GeoIP, reverse-DNS and anonymity
+    lookups run only for proxies that actually work, so dead proxies fail fast.
+
+    Args:
+        proxy (str): Proxy to check
+        test_url (str): URL to test with
+        timeout (int): Timeout in seconds
+        public_ip (str): Original public IP
+        anonymity_check_url (str): URL for anonymity check
+        progress_info (dict): Dictionary with progress information
+        config (configparser.ConfigParser): Loaded configuration (for autosave)
+        reverse_lookup (bool): Perform reverse DNS lookup for proxy IP
+        options (dict, optional): Check options from main() (e.g. single_request)
+        attempt (int): Attempt number (0 = first, >0 = retry from retry_queue)
+        progress (str, optional): Progress indicator of an earlier attempt
+
+    Returns:
+        dict: Result of the proxy check (None if queued for a retry)
+    """
+    options = options or {}
+    progress = progress or next_progress(progress_info)
+    timeout = attempt_timeout(timeout, options, attempt)
+
+    single_request, check_url, check_headers, max_bytes, speed_basis = check_request_options(
+        options, test_url, anonymity_check_url)
+
+    # A per-proxy Session keeps the upstream connection alive for the anonymity
+    # check; urllib3 reconnects transparently if the proxy closes it.
+    level = options.get('level', LEVEL_FULL)
+    with new_check_session() as session:
+        if level < LEVEL_REQUEST:
+            success, timings, connection_details, error_kind, response = test_liveness(
+                proxy, test_url, capped_timeouts(timeout, options.get('timeout_cap'), SPEED_BASIS_TOTAL)[0],
+                level == LEVEL_HANDSHAKE)
+        else:
+            success, timings, connection_details, error_kind, response = test_connectivity(
+                proxy, check_url, timeout, session, check_headers, max_bytes, options.get('timeout_cap'), speed_basis)
+        if early_stop.is_set() or schedule_retry(proxy, success, error_kind, options, attempt, progress):
+            return None
+        enrichment = None
+        if success and not needs_enrichment(timings, options):
+            enrichment = unchecked_enrichment(proxy)
+        elif success:
+            enrichment = enrich_proxy(proxy, public_ip, anonymity_check_url, reverse_lookup, session,
+                                      response if single_request else None, options.get('filters'))
+
+    return finish_check(proxy, progress, timings, connection_details, enrichment, config, reverse_lookup, speed_basis, error_kind)
+
+def connectivity_stage_worker(proxy, test_url, timeout, public_ip, anonymity_check_url, progress_info, config, reverse_lookup=False, options=None, enqueued_at=None, attempt=0, progress=None):
+    """
+    Stage 1 of the staged pipeline: connectivity only.
+
+    Failed proxies are finished right here; working ones are handed to the
+    enrichment executor, so slow GeoIP/rDNS/judge lookups never hold a
+    connectivity worker. The warm session is handed over only if an
+    enrichment worker is idle; otherwise it is closed so that queued proxies
+    do not hold sockets.
+
+    Args:
+        Same as check_proxy_worker, plus enqueued_at (float): submit timestamp for queue metrics
+
+    Returns:
+        None
+    """
+    options = options or {}
+    timeout = attempt_timeout(timeout, options, attempt)
+    connectivity = pipeline_stages['connectivity']
+    enrichment_stage = pipeline_stages['enrichment']
+    connectivity.start(enqueued_at)
+    try:
+        progress = progress or next_progress(progress_info)
+        single_request, check_url, check_headers, max_bytes, speed_basis = check_request_options(
+            options, test_url, anonymity_check_url)
+
+        session = new_check_session()
+        success, timings, connection_details, error_kind, response = test_connectivity(
+            proxy, check_url, timeout, session, check_headers, max_bytes, options.get('timeout_cap'), speed_basis)
+        if early_stop.is_set():
+            # --want is satisfied: the enrichment stage is already shut down
+            session.close()
+            return
+        if not success:
+            session.close()
+            if schedule_retry(proxy, success, error_kind, options, attempt, progress):
+                return
+            finish_check(proxy, progress, timings, connection_details, None, config, reverse_lookup, error_kind=error_kind)
+            return
+
+        schedule_retry(proxy, success, error_kind, options, attempt, progress)
+        if not needs_enrichment(timings, options):
+            # Too slow for --filter-status: the lookups would be thrown away
+            session.close()
+            finish_check(proxy, progress, timings, connection_details, unchecked_enrichment(proxy),
+                         config, reverse_lookup, speed_basis)
+            return
+        if enrichment_stage.queued + enrichment_stage.active >= enrichment_stage.workers:
+            session.close()
+            session = None
+        judge_response = response if single_request else None
+
+        def enrichment_task(enrichment_enqueued_at):
+            enrichment_stage.start(enrichment_enqueued_at)
+            try:
+                if early_stop.is_set():
+                    return
+                enrichment = enrich_proxy(proxy, public_ip, anonymity_check_url, reverse_lookup, session, judge_response,
+                                          options.get('filters'))
+                finish_check(proxy, progress, timings, connection_details, enrichment, config, reverse_lookup, speed_basis)
+            except Exception as e:
+                if global_args.debug:
+                    debug_print(f"Error enriching proxy {proxy}: {str(e)}", "error", print_lock)
+            finally:
+                enrichment_stage.finish()
+
+        try:
+            enrichment_executor.submit(enrichment_task, enrichment_stage.enqueue())
+        except (RuntimeError, AttributeError):
+            # --want was satisfied meanwhile: the enrichment stage is shut down (or reset to None)
+            if session is not None:
+                session.close()
+    finally:
+        connectivity.finish()
+
+def network_of(host):
+    """
+    Returns the network a proxy host belongs to for the per-subnet cap.
+
+    Args:
+        host (str): Proxy host (IP address or hostname)
+
+    Returns:
+        str: The /24 (IPv4) or /48 (IPv6) network, or the hostname itself
+    """
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return host  # not resolved here: every hostname is its own network
+    prefix = 24 if address.version == 4 else 48
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+class NetworkScheduler:
+    """
+    Feeds proxies to an engine with caps on concurrent checks per host and per network.
+
+    Proxies are pulled lazily from the source into per-network queues (at most
+    `lookahead` at a time) and handed out round-robin over networks, and over
+    hosts within a network, so a list with dozens of ports on one /24 is
+    interleaved with other providers instead of hitting one network at once.
+    Not thread-safe: take() and release() are called from the submitting loop.
+    """
+
+    def __init__(self, proxies, per_host=0, per_subnet=0, lookahead=SCHEDULER_LOOKAHEAD):
+        self.source = iter(proxies)
+        self.per_host = per_host or float('inf')
+        self.per_subnet = per_subnet or float('inf')
+        self.lookahead = lookahead
+        self.exhausted = False
+        self.buffered = 0
+        self.networks = collections.deque()  # ring of networks with buffered proxies
+        self.hosts = {}                      # network -> ring of hosts with buffered proxies
+        self.queues = {}                     # host -> buffered proxies
+        self.active_hosts = collections.Counter()
+        self.active_networks = collections.Counter()
+
+    def _fill(self):
+        while not self.exhausted and self.buffered < self.lookahead:
+            proxy = next(self.source, None)
+            if proxy is None:
+                self.exhausted = True
+                break
+            host = urlparse(proxy).hostname
+            if host not in self.queues:
+                network = network_of(host)
+                if network not in self.hosts:
+                    self.hosts[network] = collections.deque()
+                    self.networks.append(network)
+                self.hosts[network].append(host)
+                self.queues[host] = collections.deque()
+            self.queues[host].append(proxy)
+            self.buffered += 1
+
+    def try_acquire(self, proxy):
+        """Counts proxy as running if its host and network are below their caps."""
+        host = urlparse(proxy).hostname
+        network = network_of(host)
+        if self.active_hosts[host] >= self.per_host or self.active_networks[network] >= self.per_subnet:
+            return False
+        self.active_hosts[host] += 1
+        self.active_networks[network] += 1
+        return True
+
+    def release(self, proxy):
+        """Marks a check taken with take() or try_acquire() as finished."""
+        host = urlparse(proxy).hostname
+        network = network_of(host)
+        self.active_hosts[host] -= 1
+        self.active_networks[network] -= 1
+        if not self.active_hosts[host]:
+            del self.active_hosts[host]
+        if not self.active_networks[network]:
+            del self.active_networks[network]
+
+    def take(self):
+        """
+        Returns the next proxy that may start now, or None if every buffered
+        proxy is held back by a cap (or nothing is left).
+        """
+        self._fill()
+        for _ in range(len(self.networks)):
+            network = self.networks[0]
+            self.networks.rotate(-1)
+            if self.active_networks[network] >= self.per_subnet:
+                continue
+            hosts = self.hosts[network]
+            for _ in range(len(hosts)):
+                host = hosts[0]
+                hosts.rotate(-1)
+                if self.active_hosts[host] >= self.per_host:
+                    continue
+                proxy = self.queues[host].popleft()
+                self.buffered -= 1
+                if not self.queues[host]:
+                    hosts.pop()  # host was rotated to the end
+                    del self.queues[host]
+                    if not hosts:
+                        self.networks.pop()
+                        del self.hosts[network]
+                self.try_acquire(proxy)
+                return proxy
+        return None
+
+    def ready(self, count):
+        """Returns up to count proxies that may start now."""
+        proxies = []
+        while len(proxies) < count:
+            proxy = self.take()
+            if proxy is None:
+                break
+            proxies.append(proxy)
+        return proxies
+
+def make_scheduler(proxies, options):
+    """
+    Creates a NetworkScheduler if per-host or per-subnet caps are configured.
+
+    Args:
+        proxies (iterable): Proxies to check
+        options (dict): Check options with 'max_per_host' and 'max_per_subnet'
+
+    Returns:
+        NetworkScheduler: Scheduler, or None to feed proxies in input order
+    """
+    options = options or {}
+    if not (options.get('max_per_host') or options.get('max_per_subnet')):
+        return None
+    return NetworkScheduler(proxies, options.get('max_per_host', 0), options.get('max_per_subnet', 0))
+
+def next_checks(proxy_iter, scheduler, free):
+    """
+    Returns up to `free` checks that may start now, as (proxy, attempt, progress).
+
+    Fresh proxies come first; retries queued by schedule_retry() only get the
+    slots they leave free, and also respect the scheduler's caps. Once the time
+    budget is used up or --want is satisfied nothing starts any more.
+
+    Args:
+        proxy_iter (iterator): Fresh proxies (used without a scheduler)
+        scheduler (NetworkScheduler): Scheduler, or None
+        free (int): Number of free slots in the window
+
+    Returns:
+        list: Checks to start
+    """
+    if budget_exhausted() or early_stop.is_set():
+        return []  # the rest of the list is skipped
+    free = max(0, free)
+    if scheduler is None:
+        checks = [(proxy, 0, None) for proxy in itertools.islice(proxy_iter, free)]
+    else:
+        checks = [(proxy, 0, None) for proxy in scheduler.ready(free)]
+    while retry_queue and len(checks) < free:
+        if scheduler is not None and not scheduler.try_acquire(retry_queue[0][0]):
+            break
+        checks.append(retry_queue.popleft())
+    return checks
+
+def run_threaded_checks(proxies, thread_count, check_args, enrich_workers=0):
+    """
+    Runs check_proxy_worker in a ThreadPoolExecutor with bounded, streaming submission.
+
+    Instead of creating one Future per proxy up front, at most
+    SUBMIT_WINDOW_FACTOR * thread_count checks are queued at any time and new
+    proxies are pulled lazily from the iterator as checks finish, so memory use
+    does not grow with the length of the list and the first checks start at once.
+    Retries queued by schedule_retry() are submitted only once the list is exhausted.
+    With per-host/per-subnet caps, a NetworkScheduler decides which proxy is next.
+
+    With enrich_workers > 0 the check is split into a staged pipeline: the
+    thread_count workers only test connectivity and a separate pool of
+    enrich_workers threads runs the anonymity check, GeoIP and reverse DNS.
+
+    Args:
+        proxies (iterable): Proxies to check
+        thread_count (int): Number of worker threads
+        check_args (tuple): Remaining positional arguments for check_proxy_worker
+        enrich_workers (int): Size of the enrichment stage (0 = no pipeline)
+
+    Returns:
+        None
+    """
+    global enrichment_executor, pipeline_stages
+
+    proxy_iter = iter(proxies)
+    scheduler = make_scheduler(proxy_iter, check_args[-1])
+    in_flight = set()
+    owners = {}  # future -> proxy, to release the scheduler's caps
+
+    # With the adaptive controller the pool is sized for its upper bound and the
+    # controller's limit caps how many checks are submitted (= running) at once.
+    if concurrency_controller is not None:
+        thread_count = concurrency_controller.maximum
+
+    if enrich_workers:
+        pipeline_stages = {
+            'connectivity': StageMetrics("connectivity", thread_count),
+            'enrichment': StageMetrics("enrichment", enrich_workers),
+        }
+        enrichment_executor = ThreadPoolExecutor(max_workers=enrich_workers)
+
+    def submit(executor, proxy, attempt=0, progress=None):
+        if enrich_workers:
+            return executor.submit(connectivity_stage_worker, proxy, *check_args,
+                                   enqueued_at=pipeline_stages['connectivity'].enqueue(),
+                                   attempt=attempt, progress=progress)
+        return executor.submit(check_proxy_worker, proxy, *check_args, attempt=attempt, progress=progress)
+
+    executor = ThreadPoolExecutor(max_workers=thread_count)
+    try:
+        while True:
+            if concurrency_controller is not None:
+                window = concurrency_controller.limit
+            else:
+                window = max(1, thread_count * SUBMIT_WINDOW_FACTOR)
+            for proxy, attempt, progress in next_checks(proxy_iter, scheduler, window - len(in_flight)):
+                future = submit(executor, proxy, attempt, progress)
+                in_flight.add(future)
+                owners[future] = proxy
+            if not in_flight:
+                break
+
+            done, in_flight = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                proxy = owners.pop(future)
+                if scheduler is not None:
+                    scheduler.release(proxy)
+                try:
+                    # Retrieve the result (but we already saved it in the worker)
+                    future.result()
+                except Exception as e:
+                    if global_args.debug:
+                        debug_print(f"Error processing proxy: {str(e)}", "error", print_lock)
+            report_pipeline_depth()
+            if early_stop.is_set():
+                # --want is satisfied: queued checks are dropped and running ones aborted
+                # below; their results are no longer recorded
+                break
+    finally:
+        stopping = early_stop.is_set()
+        executor.shutdown(wait=not stopping, cancel_futures=stopping)
+        if enrichment_executor is not None:
+            # Let the enrichment stage drain before the results are saved
+            enrichment_executor.shutdown(wait=not stopping, cancel_futures=stopping)
+            enrichment_executor = None
+            report_pipeline_depth(force=True)
+
+# ---------------------------------------------------------------------------
+# Asyncio engine
+#
+# A minimal HTTP/1.1 client on top of asyncio streams. The proxy handshake
+# (HTTP CONNECT, SOCKS4, SOCKS5) is done on a raw non-blocking socket, which is
+# then wrapped into a (TLS) stream for the actual request. This keeps thousands
+# of checks in flight on one event loop without an OS thread per proxy.
+# ---------------------------------------------------------------------------
+
+ENGINE_THREADS = "threads"
+ENGINE_ASYNCIO = "asyncio"
+
+# Upper bound for a response body read by the asyncio client
+ASYNC_MAX_BODY = 1024 * 1024
+
+# Worker threads for the blocking GeoIP / reverse-DNS lookups of the asyncio engine
+ASYNC_ENRICH_THREADS = 32
+
+class ProxyProtocolError(Exception):
+    """Raised when a proxy rejects or garbles a handshake or HTTP response."""
+
+# Redirects followed by the asyncio engine, as requests does for GET
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 30  # requests.models.DEFAULT_REDIRECT_LIMIT
+
+# Everything a single asyncio check may raise for a dead or misbehaving proxy
+ASYNC_CHECK_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ProxyProtocolError, ValueError,
+                      CheckLimitExceeded)
+
+def raise_open_file_limit(wanted):
+    """
+    Raises the soft RLIMIT_NOFILE so that many concurrent sockets can be opened.
+
+    Args:
+        wanted (int): Desired number of file descriptors
+
+    Returns:
+        None
+    """
+    if resource is None:
+        return
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        if soft != resource.RLIM_INFINITY and target > soft:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            debug_print(f"Raised open file limit from {soft} to {target}", "debug", print_lock)
+    except (ValueError, OSError) as e:
+        debug_print(f"Could not raise open file limit: {str(e)}", "debug", print_lock)
+
+def proxy_basic_auth(username, password):
+    """
+    Builds the Proxy-Authorization header value for an HTTP proxy with credentials.
+
+    Args:
+        username (str): Proxy username (None for a proxy without credentials)
+        password (str): Proxy password
+
+    Returns:
+        str: Header value, or None if the proxy has no credentials
+    """
+    if not username:
+        return None
+    credentials = f"{username}:{password or ''}".encode("utf-8")
+    return "Basic " + base64.b64encode(credentials).decode("ascii")
+
+async def _sock_recv_exact(sock, size, timeout):
+    """Receives exactly size bytes from a non-blocking socket."""
+    loop = asyncio.get_event_loop()
+    data = b""
+    while len(data) < size:
+        chunk = await asyncio.wait_for(loop.sock_recv(sock, size - len(data)), timeout)
+        if not chunk:
+            raise ProxyProtocolError("Connection closed during handshake")
+        data += chunk
+    return data
+
+async def _resolve(host, port, family=socket.AF_UNSPEC):
+    """Resolves host:port without blocking the event loop."""
+    loop = asyncio.get_event_loop()
+    infos = await loop.getaddrinfo(host, port, family=family, type=socket.SOCK_STREAM)
+    if not infos:
+        raise OSError(f"Could not resolve {host}")
+    return infos[0]
+
+def connect_request(target_host, target_port, username=None, password=None):
+    """
+    Builds the CONNECT request that opens a tunnel through an HTTP(S) proxy.
+
+    Args:
+        target_host (str): Target host to tunnel to
+        target_port (int): Target port to tunnel to
+        username (str, optional): Proxy username (sent as Basic auth)
+        password (str, optional): Proxy password
+
+    Returns:
+        bytes: Complete request including the blank line
+    """
+    request = f"CONNECT {target_host}:{target_port} HTTP/1.1\r\nHost: {target_host}:{target_port}\r\n"
+    auth = proxy_basic_auth(username, password)
+    if auth:
+        request += f"Proxy-Authorization: {auth}\r\n"
+    return (request + "\r\n").encode("latin-1")
+
+def check_connect_reply(reply):
+    """
+    Checks the reply of an HTTP(S) proxy to a CONNECT request.
+
+    Args:
+        reply (bytes): Reply up to and including the blank line
+
+    Raises:
+        ProxyProtocolError: The proxy refused the tunnel
+    """
+    status_line = reply.split(b"\r\n", 1)[0]
+    fields = status_line.split()
+    if len(fields) < 2 or not fields[1].startswith(b"2"):
+        raise ProxyProtocolError(f"CONNECT rejected: {status_line.decode('latin-1')}")
+
+async def async_proxy_connect(proxy, target_host, target_port, timeout, tunnel=True, marks=None):
+    """
+    Connects to a proxy and optionally tunnels to target_host:target_port.
+
+    HTTP proxies are tunnelled with CONNECT, SOCKS4 and SOCKS5 with their
+    native handshakes. Like requests/PySocks for socks4:// and socks5://, the
+    target hostname is resolved locally. HTTPS proxies need TLS before the
+    CONNECT, so they only get the bare connection here (see async_open_tunnel()).
+
+    Args:
+        proxy (str): Proxy URL
+        target_host (str): Target host to tunnel to
+        target_port (int): Target port to tunnel to
+        timeout (int): Timeout in seconds for each network operation
+        tunnel (bool): Perform the handshake; False returns the bare proxy connection
+        marks (dict, optional): Receives the "connected" and "tunnelled" timestamps
+
+    Returns:
+        socket.socket: Connected non-blocking socket
+    """
+    marks = marks if marks is not None else {}
+    loop = asyncio.get_event_loop()
+    parsed = urlparse(proxy)
+    protocol = parsed.scheme.lower()
+
+    family, _, _, _, address = await asyncio.wait_for(_resolve(parsed.hostname, parsed.port), timeout)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        await asyncio.wait_for(loop.sock_connect(sock, address), timeout)
+        marks["connected"] = time.time()
+        if not tunnel:
+            return sock
+
+        if protocol == PROTOCOL_HTTP:
+            await asyncio.wait_for(loop.sock_sendall(sock, connect_request(target_host, target_port, parsed.username, parsed.password)), timeout)
+            reply = b""
+            while b"\r\n\r\n" not in reply:
+                chunk = await asyncio.wait_for(loop.sock_recv(sock, 4096), timeout)
+                if not chunk or len(reply) > 16384:
+                    raise ProxyProtocolError("Invalid CONNECT response")
+                reply += chunk
+            check_connect_reply(reply)
+
+        elif protocol == PROTOCOL_SOCKS4:
+            _, _, _, _, target_address = await asyncio.wait_for(_resolve(target_host, target_port, socket.AF_INET), timeout)
+            user_id = (parsed.username or "").encode("utf-8")
+            request = struct.pack(">BBH", 4, 1, int(target_port)) + socket.inet_aton(target_address[0]) + user_id + b"\x00"
+            await asyncio.wait_for(loop.sock_sendall(sock, request), timeout)
+            reply = await _sock_recv_exact(sock, 8, timeout)
+            if reply[1] != 0x5A:
+                raise ProxyProtocolError(f"SOCKS4 request rejected (code {reply[1]:#x})")
+
+        elif protocol == PROTOCOL_SOCKS5:
+            methods = b"\x00\x02" if parsed.username else b"\x00"
+            await asyncio.wait_for(loop.sock_sendall(sock, b"\x05" + bytes([len(methods)]) + methods), timeout)
+            reply = await _sock_recv_exact(sock, 2, timeout)
+            if reply[0] != 5 or reply[1] not in methods:
+                raise ProxyProtocolError("SOCKS5 greeting rejected")
+            if reply[1] == 2:
+                username = (parsed.username or "").encode("utf-8")
+                password = (parsed.password or "").encode("utf-8")
+                auth = b"\x01" + bytes([len(username)]) + username + bytes([len(password)]) + password
+                await asyncio.wait_for(loop.sock_sendall(sock, auth), timeout)
+                if (await _sock_recv_exact(sock, 2, timeout))[1] != 0:
+                    raise ProxyProtocolError("SOCKS5 authentication failed")
+
+            target_family, _, _, _, target_address = await asyncio.wait_for(_resolve(target_host, target_port), timeout)
+            if target_family == socket.AF_INET6:
+                address_bytes = b"\x04" + socket.inet_pton(socket.AF_INET6, target_address[0])
+            else:
+                address_bytes = b"\x01" + socket.inet_aton(target_address[0])
+            request = b"\x05\x01\x00" + address_bytes + struct.pack(">H", int(target_port))
+            await asyncio.wait_for(loop.sock_sendall(sock, request), timeout)
+            reply = await _sock_recv_exact(sock, 4, timeout)
+            if reply[1] != 0:
+                raise ProxyProtocolError(f"SOCKS5 connect rejected (code {reply[1]:#x})")
+            bound_length = {1: 4, 4: 16}.get(reply[3])
+            if bound_length is None:
+                bound_length = (await _sock_recv_exact(sock, 1, timeout))[0]
+            await _sock_recv_exact(sock, bound_length + 2, timeout)
+
+        else:
+            raise ProxyProtocolError(f"Unsupported proxy type: {protocol}")
+
+        marks["tunnelled"] = time.time()
+        return sock
+    except BaseException:
+        sock.close()
+        raise
+
+async def async_open_tunnel(proxy, target_host, target_port, timeout, tunnel=True, tls=False, marks=None):
+    """
+    Opens a stream to target_host:target_port through a proxy, optionally wrapped in TLS.
+
+    Like urllib3 2 (and so the threaded engine), https:// proxies are spoken to
+    over TLS: the CONNECT request, or with tunnel=False the proxied request
+    itself, runs inside a TLS connection to the proxy, and a TLS target gets a
+    second TLS layer inside it.
+
+    Args:
+        proxy (str): Proxy URL
+        target_host (str): Target host
+        target_port (int): Target port
+        timeout (int): Timeout in seconds for each network operation
+        tunnel (bool): Open a tunnel; False leaves the stream at the proxy (absolute-form requests)
+        tls (bool): Wrap the tunnel in TLS to the target
+        marks (dict, optional): Receives the "connected", "tunnelled" and "handshaken" timestamps
+
+    Returns:
+        tuple: (asyncio.StreamReader, asyncio.StreamWriter)
+    """
+    marks = marks if marks is not None else {}
+    parsed = urlparse(proxy)
+    if parsed.scheme.lower() != PROTOCOL_HTTPS:
+        sock = await async_proxy_connect(proxy, target_host, target_port, timeout, tunnel=tunnel, marks=marks)
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(sock=sock, ssl=tls_client_context() if tls else None,
+                                        server_hostname=target_host if tls else None),
+                timeout
+            )
+        except BaseException:
+            sock.close()
+            raise
+        if tls:
+            marks["handshaken"] = time.time()
+        return reader, writer
+
+    sock = await async_proxy_connect(proxy, target_host, target_port, timeout, tunnel=False, marks=marks)
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(sock=sock, ssl=tls_client_context(), server_hostname=parsed.hostname),
+            timeout
+        )
+    except BaseException:
+        sock.close()
+        raise
+    try:
+        if tunnel:
+            writer.write(connect_request(target_host, target_port, parsed.username, parsed.password))
+            await asyncio.wait_for(writer.drain(), timeout)
+            try:
+                reply = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                raise ProxyProtocolError("Invalid CONNECT response") from None
+            check_connect_reply(reply)
+            marks["tunnelled"] = time.time()
+        if tls:
+            if not hasattr(writer, "start_tls"):
+                raise ProxyProtocolError("TLS through an https:// proxy needs Python 3.11 or newer")
+            await asyncio.wait_for(writer.start_tls(tls_client_context(), server_hostname=target_host), timeout)
+            marks["handshaken"] = time.time()
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer
+
+async def async_read_response(reader, timeout, max_body=ASYNC_MAX_BODY, marks=None):
+    """
+    Reads an HTTP/1.1 response (status line, headers, body) from a stream.
+
+    Args:
+        reader (asyncio.StreamReader): Stream positioned at the status line
+        timeout (int): Timeout in seconds for each read
+        max_body (int): Stop reading the body after this many bytes (also within a chunk)
+        marks (dict, optional): Receives the "first_byte" timestamp
+
+    Returns:
+        tuple: (status_code, headers, body) with lower-cased header names
+    """
+    status_line = await asyncio.wait_for(reader.readline(), timeout)
+    if marks is not None:
+        marks["first_byte"] = time.time()
+    parts = status_line.decode("latin-1").split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+        raise ProxyProtocolError("Malformed HTTP status line")
+    status_code = int(parts[1])
+
+    headers = {}
+    while True:
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    body = bytearray()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while len(body) < max_body:
+            size_line = await asyncio.wait_for(reader.readline(), timeout)
+            size = int(size_line.split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                break
+            # Never buffer more than max_body, whatever chunk size the server announces;
+            # a cut-off chunk leaves the connection unusable, so it is not kept alive
+            wanted = min(size, max_body - len(body))
+            body += await asyncio.wait_for(reader.readexactly(wanted), timeout)
+            if wanted < size:
+                break
+            await asyncio.wait_for(reader.readline(), timeout)  # CRLF after each chunk
+    elif "content-length" in headers:
+        length = min(int(headers["content-length"]), max_body)
+        body += await asyncio.wait_for(reader.readexactly(length), timeout)
+    else:
+        while len(body) < max_body:
+            chunk = await asyncio.wait_for(reader.read(65536), timeout)
+            if not chunk:
+                break
+            body += chunk
+
+    return status_code, headers, bytes(body[:max_body])
+
+async def async_http_get(proxy, url, timeout, headers=None, session=None, max_body=ASYNC_MAX_BODY, marks=None):
+    """
+    Performs a GET request for url through proxy on the running event loop.
+
+    Plain-HTTP URLs go through HTTP proxies in absolute form (like requests does);
+    everything else is tunnelled and, for https:// URLs, wrapped in TLS.
+
+    With a session dict, the connection is kept alive after the response and
+    reused by the next request to the same origin (or, for HTTP proxies and
+    plain-HTTP URLs, to any origin). A stale kept-alive connection falls back
+    to a fresh one.
+
+    Args:
+        proxy (str): Proxy URL
+        url (str): URL to fetch
+        timeout (int): Timeout in seconds for each network operation
+        headers (dict, optional): Extra request headers
+        session (dict, optional): Per-proxy connection state, see close_async_session()
+        max_body (int): Stop reading the body after this many bytes
+        marks (dict, optional): Receives the time.time() of each phase: "connected",
+            "tunnelled" (CONNECT/SOCKS), "handshaken" (TLS), "first_byte" and "done"
+
+    Returns:
+        tuple: (status_code, headers, body)
+    """
+    target = urlparse(url)
+    scheme = target.scheme.lower()
+    target_port = target.port or (443 if scheme == "https" else 80)
+    parsed_proxy = urlparse(proxy)
+    absolute_form = scheme == "http" and parsed_proxy.scheme.lower() in (PROTOCOL_HTTP, PROTOCOL_HTTPS)
+    key = ("absolute",) if absolute_form else (scheme, target.hostname, target_port)
+
+    if absolute_form:
+        request_target = url
+    else:
+        request_target = (target.path or "/") + (f"?{target.query}" if target.query else "")
+    request_headers = {
+        "Host": target.netloc.rsplit("@", 1)[-1],
+        "User-Agent": requests.utils.default_user_agent(),
+        "Accept": "*/*",
+        "Connection": "keep-alive" if session is not None else "close",
+    }
+    auth = proxy_basic_auth(parsed_proxy.username, parsed_proxy.password) if absolute_form else None
+    if auth:
+        request_headers["Proxy-Authorization"] = auth
+    request_headers.update(headers or {})
+    request = f"GET {request_target} HTTP/1.1\r\n"
+    request += "".join(f"{name}: {value}\r\n" for name, value in request_headers.items())
+    request = (request + "\r\n").encode("latin-1")
+
+    async def send(reader, writer):
+        writer.write(request)
+        await asyncio.wait_for(writer.drain(), timeout)
+        return await async_read_response(reader, timeout, max_body, marks)
+
+    response = None
+    if session is not None and session.get("key") == key:
+        reader, writer = session.pop("reader"), session.pop("writer")
+        session.pop("key")
+        try:
+            response = await send(reader, writer)
+            debug_print(f"Reused keep-alive connection through {proxy}", "debug", print_lock)
+        except (ConnectionError, asyncio.IncompleteReadError, ProxyProtocolError):
+            # The proxy closed the idle connection: fall back to a fresh one
+            writer.close()
+        except BaseException:
+            writer.close()
+            raise
+    close_async_session(session)
+
+    if response is None:
+        reader, writer = await async_open_tunnel(proxy, target.hostname, target_port, timeout,
+                                                 tunnel=not absolute_form, tls=scheme == "https", marks=marks)
+        try:
+            response = await send(reader, writer)
+        except BaseException:
+            writer.close()
+            raise
+
+    status_code, response_headers, body = response
+    chunked = response_headers.get("transfer-encoding", "").lower() == "chunked"
+    reusable = (session is not None
+                and response_headers.get("connection", "").lower() != "close"
+                and (chunked or "content-length" in response_headers)
+                and len(body) < max_body)
+    if reusable:
+        session.update(key=key, reader=reader, writer=writer)
+    else:
+        writer.close()
+    if marks is not None:
+        marks["done"] = time.time()
+    return response
+
+def tls_client_context():
+    """
+    Returns the TLS client context shared by the asyncio engine and the level-1 handshake.
+
+    Loading the CA store takes tens of milliseconds (on the event loop thread,
+    for the asyncio engine), so the context is built on first use only. It trusts the same CA bundle as
+    requests, so both engines accept the same certificates.
+
+    Returns:
+        ssl.SSLContext: Client context with certificate and hostname verification
+    """
+    global tls_context
+    if tls_context is None:
+        tls_context = ssl.create_default_context(cafile=requests.certs.where())
+    return tls_context
+
+async def async_http_get_limited(proxy, url, timeout, headers=None, session=None, max_body=None, marks=None,
+                                 time_limit=None, first_byte_limit=None):
+    """
+    async_http_get() under the wall-clock limit of request_time_limit() and the
+    response size limit, following redirects like requests does.
+
+    Args:
+        Same as async_http_get(), except max_body (int): stop reading the body
+        after this many bytes; None reads the whole body, and one larger than
+        --max-response raises CheckLimitExceeded
+        time_limit (float, optional): Wall-clock limit (default: request_time_limit(timeout))
+        first_byte_limit (float, optional): Wall-clock limit until the first response byte
+
+    Returns:
+        tuple: (status_code, headers, body)
+    """
+    limit = max_response_bytes + 1 if max_body is None else max_body
+    time_limit = time_limit or request_time_limit(timeout)
+    marks = marks if marks is not None else {}
+    started = time.monotonic()
+
+    async def follow_redirects():
+        # Like requests' session.get(): redirects are followed, all within the deadline
+        location = url
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await async_http_get(proxy, location, timeout, headers=headers, session=session,
+                                            max_body=limit, marks=marks)
+            status_code, response_headers, _ = response
+            if status_code not in REDIRECT_STATUSES or "location" not in response_headers:
+                return response
+            location = urljoin(location, response_headers["location"])
+            debug_print(f"Following redirect through {proxy} to {location}", "debug", print_lock)
+        raise requests.TooManyRedirects(f"Exceeded {MAX_REDIRECTS} redirects")
+
+    request = asyncio.ensure_future(follow_redirects())
+    try:
+        if first_byte_limit is not None and first_byte_limit < time_limit:
+            await asyncio.wait({request}, timeout=first_byte_limit)
+            if not request.done() and "first_byte" not in marks:
+                raise CheckLimitExceeded(ERROR_DEADLINE, f"No response within {first_byte_limit:g} s")
+        response = await asyncio.wait_for(request, max(0, time_limit - (time.monotonic() - started)))
+    except asyncio.TimeoutError:
+        if time.monotonic() - started >= time_limit:
+            raise CheckLimitExceeded(ERROR_DEADLINE, f"Deadline of {time_limit:g} s exceeded") from None
+        raise  # a single read or connect timed out
+    finally:
+        request.cancel()
+    if max_body is None and len(response[2]) > max_response_bytes:
+        close_async_session(session)
+        raise CheckLimitExceeded(ERROR_OVERSIZE, f"Response body larger than {max_response_bytes} bytes")
+    return response
+
+def close_async_session(session):
+    """
+    Closes the kept-alive connection of an async_http_get() session, if any.
+
+    Args:
+        session (dict): Per-proxy connection state (may be None)
+
+    Returns:
+        None
+    """
+    if session:
+        writer = session.get("writer")
+        if writer is not None:
+            writer.close()
+        session.clear()
+
+async def check_anonymity_async(proxy, anonymity_check_url, original_ip, session=None):
+    """
+    Asyncio counterpart of check_anonymity().
+
+    Args:
+        proxy (str): Proxy to check
+        anonymity_check_url (str): URL to use for checking anonymity
+        original_ip (str): Original IP address for comparison
+        session (dict, optional): async_http_get() session to reuse the proxy connection
+
+    Returns:
+        tuple: (detected_ip, anonymity_level)
+    """
+    debug_print(f"Checking anonymity for {proxy}", "debug", print_lock)
+    await throttle_async(anonymity_check_url)
+    try:
+        status_code, response_headers, body = await async_http_get_limited(
+            proxy, anonymity_check_url, budget_timeout(10), headers=ANONYMITY_CHECK_HEADERS, session=session)
+    except ASYNC_CHECK_ERRORS as e:
+        debug_print(f"Anonymity check exception: {type(e).__name__}: {str(e)}", "debug", print_lock)
+        return "Unknown", "Failed"
+
+    # Same charset rules as requests' response.encoding in check_anonymity()
+    text = decode_body(body, requests.utils.get_encoding_from_headers(response_headers))
+    return anonymity_from_judge(status_code, text, original_ip)
+
+async def test_connectivity_async(proxy, url, timeout, session, headers=None, max_bytes=DEFAULT_TEST_MAX_BYTES,
+                                  timeout_cap=None, speed_basis=SPEED_BASIS_TOTAL):
+    """
+    Asyncio counterpart of test_connectivity().
+
+    The raw-socket client sees every phase, so connect (TCP to the proxy),
+    handshake (CONNECT/SOCKS tunnel and TLS), TTFB and total are all measured.
+
+    Returns:
+        tuple: (success, timings, connection_details, error_kind, response)
+               where response is (status_code, headers, body) or None
+    """
+    marks = {}
+    await throttle_async(url)
+    timeout = budget_timeout(timeout)
+    request_timeout, first_byte_limit = capped_timeouts(timeout, timeout_cap, speed_basis)
+    try:
+        start_time = time.time()
+        response = await async_http_get_limited(proxy, url, request_timeout, headers=headers, session=session,
+                                                max_body=max_bytes, marks=marks, time_limit=request_time_limit(timeout),
+                                                first_byte_limit=first_byte_limit)
+        handshake_end = marks.get("handshaken", marks.get("tunnelled"))
+        timings = {
+            "connect_time": (marks["connected"] - start_time) * 1000 if "connected" in marks else None,
+            "handshake_time": (handshake_end - marks["connected"]) * 1000 if handshake_end else None,
+            "ttfb": (marks["first_byte"] - start_time) * 1000,
+            "total": (marks["done"] - start_time) * 1000,
+        }
+        outcome = (response[0] < 400, timings, f"HTTP {response[0]}", None, response)
+    except CheckLimitExceeded as e:
+        outcome = (False, None, f"Error: {e}", e.kind, None)
+    except ASYNC_CHECK_ERRORS as e:
+        outcome = (False, None, f"Error: {type(e).__name__}", classify_error(e), None)
+    record_outcome(outcome[0], outcome[1]["total"] if outcome[1] else "N/A", outcome[3])
+    return outcome
+
+async def test_liveness_async(proxy, test_url, timeout, handshake=False):
+    """
+    Asyncio counterpart of test_liveness(); the raw-socket client also
+    separates the TCP connect from the handshake at level 1.
+
+    Returns:
+        tuple: Same shape as test_connectivity(); response is always None
+    """
+    target = urlparse(test_url)
+    target_port = target.port or (443 if target.scheme.lower() == "https" else 80)
+    marks = {}
+    timeout = budget_timeout(timeout)
+    try:
+        start_time = time.time()
+        if handshake:
+            _, writer = await async_open_tunnel(proxy, target.hostname, target_port, timeout, marks=marks)
+            writer.close()
+        else:
+            (await async_proxy_connect(proxy, target.hostname, target_port, timeout, tunnel=False, marks=marks)).close()
+        connect_time = (marks["connected"] - start_time) * 1000
+        timings = {"connect_time": connect_time, "total": (time.time() - start_time) * 1000}
+        if handshake:
+            timings["handshake_time"] = (marks["tunnelled"] - marks["connected"]) * 1000
+        outcome = (True, timings, "Handshake OK" if handshake else "TCP connect OK", None, None)
+    except ASYNC_CHECK_ERRORS as e:
+        outcome = (False, None, f"Error: {type(e).__name__}", classify_error(e), None)
+    record_outcome(outcome[0], outcome[1]["total"] if outcome[1] else "N/A", outcome[3])
+    return outcome
+
+async def enrich_proxy_async(proxy, public_ip, anonymity_check_url, reverse_lookup, session, judge_response=None, filters=None):
+    """
+    Asyncio counterpart of enrich_proxy().
+
+    GeoIP and reverse-DNS lookups are blocking and share their caches with the
+    threaded engine, so they run in the loop's default executor.
+
+    Returns:
+        tuple: (hostname, country, city, anonymity)
+    """
+    host = urlparse(proxy).hostname
+    if budget_exhausted():
+        close_async_session(session)
+        return unchecked_enrichment(proxy)
+    try:
+        if judge_response is not None:
+            status_code, response_headers, body = judge_response
+            text = decode_body(body, requests.utils.get_encoding_from_headers(response_headers))
+            _, anonymity = anonymity_from_judge(status_code, text, public_ip)
+        else:
+            _, anonymity = await check_anonymity_async(proxy, anonymity_check_url, public_ip, session=session)
+    finally:
+        close_async_session(session)
+    filters = filters or {}
+    if budget_exhausted() or (filters.get('filter_anonymity')
+                              and anonymity not in anonymity_levels_of(filters['filter_anonymity'])):
+        return host, "Unknown", "Unknown", anonymity
+    loop = asyncio.get_event_loop()
+    country, city = await loop.run_in_executor(None, get_geoip_info, host)
+    if budget_exhausted() or not country_matches(country, filters.get('filter_country'), filters.get('filter_tld')):
+        return host, country, city, anonymity
+    hostname = await loop.run_in_executor(None, reverse_dns_lookup, host) if reverse_lookup else host
+    return hostname, country, city, anonymity
+
+async def test_connectivity_hedged_async(proxy, url, timeout, session, headers=None, max_bytes=DEFAULT_TEST_MAX_BYTES, percentile=0,
+                                         timeout_cap=None, speed_basis=SPEED_BASIS_TOTAL):
+    """
+    test_connectivity_async() with an optional hedged second attempt.
+
+    If the first attempt is still running after the given percentile of recent
+    working response times, a second attempt on its own connection is started
+    and the first successful one wins; the other is cancelled.
+
+    Args:
+        Same as test_connectivity_async, plus percentile (float): hedging percentile (0 = off)
+
+    Returns:
+        tuple: Same shape as test_connectivity_async()
+    """
+    delay = hedge_delay(percentile)
+    first = asyncio.ensure_future(test_connectivity_async(proxy, url, timeout, session, headers, max_bytes,
+                                                          timeout_cap, speed_basis))
+    if delay is None:
+        return await first
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    with retry_lock:
+        retry_stats['hedged'] += 1
+    hedge_session = {}
+    second = asyncio.ensure_future(test_connectivity_async(proxy, url, timeout, hedge_session, headers, max_bytes,
+                                                           timeout_cap, speed_basis))
+    pending = {first, second}
+    outcome = None
+    try:
+        while pending and (outcome is None or not outcome[0]):
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if outcome is None or task.result()[0]:
+                    outcome, winner = task.result(), task
+    finally:
+        for task in pending:
+            task.cancel()
+    if winner is second:
+        # Continue (enrichment) on the connection of the winning attempt
+        close_async_session(session)
+        session.update(hedge_session)
+    else:
+        close_async_session(hedge_session)
+    return outcome
+
+async def check_proxy_async(proxy, test_url, timeout, public_ip, anonymity_check_url, progress_info, config, reverse_lookup=False, options=None, attempt=0, progress=None):
+    """
+    Asyncio counterpart of check_proxy_worker(); produces the same result dict.
+
+    In the staged pipeline (enrichment_semaphore set) the coroutine returns right
+    after the connectivity test and a separate task, limited by the enrichment
+    semaphore, finishes working proxies.
+
+    Returns:
+        dict: Result of the proxy check (None if handed to the enrichment stage or queued for a retry)
+    """
+    options = options or {}
+    progress = progress or next_progress(progress_info)
+    timeout = attempt_timeout(timeout, options, attempt)
+
+    single_request, check_url, check_headers, max_bytes, speed_basis = check_request_options(
+        options, test_url, anonymity_check_url)
+
+    level = options.get('level', LEVEL_FULL)
+
+    # One kept-alive connection per proxy, shared by the speed test and the anonymity check
+    session = {}
+    try:
+        if level < LEVEL_REQUEST:
+            success, timings, connection_details, error_kind, response = await test_liveness_async(
+                proxy, test_url, capped_timeouts(timeout, options.get('timeout_cap'), SPEED_BASIS_TOTAL)[0],
+                level == LEVEL_HANDSHAKE)
+        else:
+            success, timings, connection_details, error_kind, response = await test_connectivity_hedged_async(
+                proxy, check_url, timeout, session, check_headers, max_bytes, options.get('hedge_percentile', 0),
+                options.get('timeout_cap'), speed_basis)
+        if schedule_retry(proxy, success, error_kind, options, attempt, progress) or early_stop.is_set():
+            return None
+        if not success:
+            return finish_check(proxy, progress, timings, connection_details, None, config, reverse_lookup, error_kind=error_kind)
+        if not needs_enrichment(timings, options):
+            return finish_check(proxy, progress, timings, connection_details, unchecked_enrichment(proxy),
+                                config, reverse_lookup, speed_basis)
+
+        judge_response = response if single_request else None
+        if enrichment_semaphore is None:
+            enrichment = await enrich_proxy_async(proxy, public_ip, anonymity_check_url, reverse_lookup, session, judge_response,
+                                                  options.get('filters'))
+            return finish_check(proxy, progress, timings, connection_details, enrichment, config, reverse_lookup, speed_basis)
+
+        # Hand over the warm connection only if an enrichment slot is free
+        handover = {} if enrichment_semaphore.locked() else dict(session)
+        session.clear()
+        stage = pipeline_stages['enrichment']
+        enqueued_at = stage.enqueue()
+
+        async def enrichment_task():
+            async with enrichment_semaphore:
+                stage.start(enqueued_at)
+                try:
+                    enrichment = await enrich_proxy_async(proxy, public_ip, anonymity_check_url, reverse_lookup, handover,
+                                                          judge_response, options.get('filters'))
+                    finish_check(proxy, progress, timings, connection_details, enrichment, config, reverse_lookup, speed_basis)
+                except Exception as e:
+                    if global_args.debug:
+                        debug_print(f"Error enriching proxy {proxy}: {str(e)}", "error", print_lock)
+                finally:
+                    stage.finish()
+
+        task = asyncio.ensure_future(enrichment_task())
+        enrichment_tasks.add(task)
+        task.add_done_callback(enrichment_tasks.discard)
+        return None
+    finally:
+        close_async_session(session)
+        if pipeline_stages:
+            pipeline_stages['connectivity'].finish()
+
+async def run_async_checks(proxies, concurrency, check_args, enrich_workers=0):
+    """
+    Runs check_proxy_async over all proxies with at most `concurrency` checks in flight.
+
+    Coroutines are created lazily from the proxy list, so memory stays bounded by
+    the window and not by the length of the list. With enrich_workers > 0 the
+    in-flight limit applies to connectivity tests only and enrichment runs as
+    separate tasks, at most enrich_workers at a time. Retries and the per-host/
+    per-subnet caps work as in run_threaded_checks().
+
+    Args:
+        proxies (iterable): Proxies to check
+        concurrency (int): Maximum number of checks in flight
+        check_args (tuple): Remaining positional arguments for check_proxy_async
+        enrich_workers (int): Concurrency of the enrichment stage (0 = no pipeline)
+
+    Returns:
+        None
+    """
+    global enrichment_semaphore, pipeline_stages
+
+    loop = asyncio.get_event_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max(ASYNC_ENRICH_THREADS, enrich_workers)))
+
+    def log_errors(done):
+        for task in done:
+            if task.exception() is not None and global_args.debug:
+                debug_print(f"Error processing proxy: {str(task.exception())}", "error", print_lock)
+
+    if enrich_workers:
+        enrichment_semaphore = asyncio.Semaphore(enrich_workers)
+        pipeline_stages = {
+            'connectivity': StageMetrics("connectivity", concurrency),
+            'enrichment': StageMetrics("enrichment", enrich_workers),
+        }
+
+    proxy_iter = iter(proxies)
+    scheduler = make_scheduler(proxy_iter, check_args[-1])
+    in_flight = set()
+    owners = {}  # task -> proxy, to release the scheduler's caps
+
+    while True:
+        for proxy, attempt, progress in next_checks(proxy_iter, scheduler, current_limit(concurrency) - len(in_flight)):
+            task = asyncio.ensure_future(check_proxy_async(proxy, *check_args, attempt=attempt, progress=progress))
+            in_flight.add(task)
+            owners[task] = proxy
+            if pipeline_stages:
+                # Connectivity checks start immediately, there is no queue in front of them
+                pipeline_stages['connectivity'].start(pipeline_stages['connectivity'].enqueue())
+        if not in_flight:
+            break
+
+        # Enrichment tasks wake the loop too: the one that satisfies --want ends the run
+        done, _ = await asyncio.wait(in_flight | enrichment_tasks, return_when=asyncio.FIRST_COMPLETED)
+        done &= in_flight
+        in_flight -= done
+        for task in done:
+            proxy = owners.pop(task)
+            if scheduler is not None:
+                scheduler.release(proxy)
+        log_errors(done)
+        report_pipeline_depth()
+        if early_stop.is_set():
+            # --want is satisfied: stop the checks still in flight
+            pending = in_flight | enrichment_tasks
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+            break
+    if enrichment_tasks:
+        await asyncio.wait(set(enrichment_tasks))
+    enrichment_semaphore = None
+    report_pipeline_depth(force=True)
+
+def run_asyncio_engine(proxies, concurrency, check_args, enrich_workers=0):
+    """
+    Runs all checks on a fresh event loop (blocking until finished).
+
+    Args:
+        proxies (iterable): Proxies to check
+        concurrency (int): Maximum number of checks in flight
+        check_args (tuple): Remaining positional arguments for check_proxy_async
+        enrich_workers (int): Concurrency of the enrichment stage (0 = no pipeline)
+
+    Returns:
+        None
+    """
+    # Every check holds at least one socket; leave headroom for GeoIP and files.
+    raise_open_file_limit(concurrency * 2 + 256)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(run_async_checks(proxies, concurrency, check_args, enrich_workers))
+    finally:
+        loop.close()
+
+# ---------------------------------------------------------------------------
+# Multi-process sharding
+#
+# The parent feeds small chunks of proxies into one shared task queue. Every
+# worker process pulls the next chunk as soon as it has capacity, so pending
+# work always goes to an idle process and a chunk of slow proxies only delays
+# itself. Results flow back to the parent, which owns global_results, autosave
+# and the final save.
+# ---------------------------------------------------------------------------
+
+# Proxies per chunk handed to a worker process
+SHARD_CHUNK_SIZE = 32
+
+def config_to_dict(config):
+    """
+    Converts a ConfigParser into a plain (picklable) dict of raw values.
+
+    Args:
+        config (configparser.ConfigParser): Configuration
+
+    Returns:
+        dict: {section: {key: value}}
+    """
+    return {section: dict(config.items(section, raw=True)) for section in config.sections()}
+
+def iter_shard_tasks(task_queue):
+    """
+    Yields proxies from the shared task queue until the stop sentinel (None) arrives.
+
+    Args:
+        task_queue (multiprocessing.Queue): Queue of proxy chunks
+
+    Yields:
+        str: Next proxy to check
+    """
+    while True:
+        chunk = task_queue.get()
+        if chunk is None:
+            return
+        for proxy in chunk:
+            yield proxy
+
+def shard_worker(task_queue, results_queue, args, config_data, engine, concurrency, shard_args, total, progress_counter, adaptive_bounds=None):
+    """
+    Entry point of a worker process started by run_sharded_checks().
+
+    Args:
+        task_queue (multiprocessing.Queue): Queue of proxy chunks (None = stop)
+        results_queue (multiprocessing.Queue): Queue for ("result", dict) / ("done", None) messages
+        args (argparse.Namespace): Parsed command-line arguments of the parent
+        config_data (dict): Configuration as produced by config_to_dict()
+        engine (str): Checking engine for this process
+        concurrency (int): Threads or in-flight coroutines in this process
+        shard_args (tuple): (test_url, timeout, public_ip, anonymity_check_url, reverse_lookup, options)
+        total (int): Total number of proxies across all processes
+        progress_counter (multiprocessing.Value): Progress counter shared by all processes
+        adaptive_bounds (tuple, optional): (min, max) for a per-process adaptive controller
+
+    Returns:
+        None
+    """
+    global global_args, result_queue, concurrency_controller, rate_limiters, run_deadline, timeout_tuner
+    global request_deadline, max_response_bytes, geoip_store, geoip_offline, geoip_online
+
+    # The parent handles Ctrl-C and terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    global_args = args
+    result_queue = results_queue
+    if adaptive_bounds:
+        concurrency_controller = ConcurrencyController(concurrency, *adaptive_bounds)
+
+    config = configparser.ConfigParser()
+    config.read_dict(config_data)
+
+    test_url, timeout, public_ip, anonymity_check_url, reverse_lookup, options = shard_args
+    # Every process gets an equal share of the configured rates
+    rate_limiters = load_rate_limiters(config, options.get('processes', 1))
+    run_deadline = options.get('deadline')
+    request_deadline = options.get('request_deadline', 0.0)
+    max_response_bytes = options.get('max_response_bytes', DEFAULT_MAX_RESPONSE_BYTES)
+    if options.get('adaptive_timeout'):
+        timeout_tuner = TimeoutTuner(*options['adaptive_timeout'])
+    create_caches(options.get('cache_size', DEFAULT_CACHE_SIZE))
+    if options.get('geoip_cache'):
+        geoip_store = open_geoip_store(options['geoip_cache'])
+    geoip_online = options.get('geoip_online', True)
+    if options.get('geoip_database') and geoip_offline is None:
+        # Not inherited from the parent (spawn start method): load our own copy
+        geoip_offline = load_offline_geoip(options['geoip_database'])
+    progress_info = {'current': 0, 'total': total, 'shared': progress_counter}
+    check_args = (test_url, timeout, public_ip, anonymity_check_url, progress_info, config, reverse_lookup, options)
+
+    try:
+        tasks = iter_shard_tasks(task_queue)
+        enrich_workers = options.get('enrich_workers', 0)
+        if engine == ENGINE_ASYNCIO:
+            run_asyncio_engine(tasks, concurrency, check_args, enrich_workers)
+        else:
+            run_threaded_checks(tasks, concurrency, check_args, enrich_workers)
+    finally:
+        stats = {}
+        if concurrency_controller is not None:
+            stats["adaptive"] = concurrency_controller.limit
+        if timeout_tuner is not None:
+            stats["timeout"] = timeout_tuner.describe()
+        if pipeline_stages:
+            stats["pipeline"] = {name: stage.describe() for name, stage in pipeline_stages.items()}
+        stats["retries"] = dict(retry_stats)
+        stats["rate_limits"] = {host: limiter.stats() for host, limiter in rate_limiters.items()}
+        if geoip_store is not None:
+            geoip_store.close()
+            stats["geoip_cache"] = geoip_store.stats()
+        stats["caches"] = {cache.name: cache.stats() for cache in (geoip_cache, rdns_cache)}
+        results_queue.put(("done", stats))
+
+def run_sharded_checks(proxies, process_count, engine, concurrency, shard_args, config, adaptive_bounds=None):
+    """
+    Checks proxies in process_count worker processes and merges their results.
+
+    Args:
+        proxies (list): Proxies to check
+        process_count (int): Number of worker processes
+        engine (str): Checking engine used inside every process
+        concurrency (int): Threads or in-flight coroutines per process
+        shard_args (tuple): (test_url, timeout, public_ip, anonymity_check_url, reverse_lookup, options)
+        config (configparser.ConfigParser): Loaded configuration
+        adaptive_bounds (tuple, optional): (min, max) for per-process adaptive controllers
+
+    Returns:
+        list: Per-process statistics sent by the workers when they finish
+    """
+    total = len(proxies)
+    chunk_size = max(1, min(SHARD_CHUNK_SIZE, total // (process_count * 4)))
+
+    task_queue = multiprocessing.Queue(maxsize=process_count * 4)
+    results_queue = multiprocessing.Queue()
+    progress_counter = multiprocessing.Value('i', 0)
+
+    workers = [
+        multiprocessing.Process(
+            target=shard_worker,
+            args=(task_queue, results_queue, global_args, config_to_dict(config), engine,
+                  concurrency, shard_args, total, progress_counter, adaptive_bounds),
+            daemon=True
+        )
+        for _ in range(process_count)
+    ]
+    for worker in workers:
+        worker.start()
+
+    # Feed chunks lazily from a thread; the bounded queue keeps pending work in
+    # the shared queue (where any idle process can take it) instead of in one worker.
+    def feed():
+        for start in range(0, total, chunk_size):
+            if budget_exhausted() or early_stop.is_set():
+                break
+            task_queue.put(proxies[start:start + chunk_size])
+        for _ in workers:
+            task_queue.put(None)
+
+    threading.Thread(target=feed, daemon=True).start()
+
+    finished = 0
+    worker_stats = []
+    while finished < len(workers):
+        try:
+            kind, payload = results_queue.get(timeout=1)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                debug_print("All worker processes exited unexpectedly", "error", print_lock)
+                break
+            continue
+        if kind == "done":
+            finished += 1
+            worker_stats.append(payload)
+        else:
+            record_result(payload, config)
+            if early_stop.is_set():
+                # --want is satisfied: the checks still running are not needed
+                for worker in workers:
+                    worker.terminate()
+                break
+
+    for worker in workers:
+        worker.join(timeout=1)
+    # Chunks left over after a --budget stop must not block our exit
+    task_queue.cancel_join_thread()
+
+    return worker_stats
+
+def main():
+    """
+    Main entry point of the script.
+    """
+    global global_args, global_results, concurrency_controller, rate_limiters, run_deadline, want_filters, want_target, timeout_tuner
+    global request_deadline, max_response_bytes, geoip_store, geoip_offline, geoip_online
+
+    # Register signal handler for graceful exit
+    signal.signal(signal.SIGINT, signal_handler)
+
+    # clear screen
+    clear_screen()
+
+    # Always display the banner at startup
+    display_banner()
+    print("\n")  # Add 2 lines of spacing
+
+    # Load configuration
+    config = load_config()
+
+    # Parse command line arguments
+    parser = setup_argument_parser()
+
+    # If no arguments provided, show help
+    if len(sys.argv) == 1:
+        parser.print_help()
+        sys.exit(0)
+
+    args = parser.parse_args()
+    global_args = args  # Make args globally accessible
+
+    # Create default config if requested
+    if args.config:
+        user_config = os.path.expanduser('~/.proxyreaper.conf')
+        if create_default_config(user_config):
+            debug_print(f"Created default configuration file at {user_config}", "success")
+        else:
+            debug_print(f"Failed to create configuration file", "error")
+        sys.exit(0)
+
+    # Show version and exit if requested
+    if args.version:
+        sys.exit(0)
+
+    # Override config with command line arguments
+    config = override_config_with_args(config, args)
+
+    # Extract all runtime parameters
+    params = extract_runtime_parameters(config, args)
+    if params['budget']:
+        # The budget covers the whole run, including list download and pre-checks
+        run_deadline = time.time() + params['budget'] * 60
+    request_deadline = params['request_deadline']
+    max_response_bytes = params['max_response_bytes']
+    timeout = params['timeout']
+    thread_count = params['thread_count']
+    engine = params['engine']
+    process_count = params['process_count']
+    test_url = params['test_url']
+    output_format = params['output_format']
+    anonymity_check_url = params['anonymity_check_url']
+    reverse_lookup = params['reverse_lookup']
+
+    # Extract filter parameters
+    filters = {
+        'filter_status': params['filter_status'],
+        'filter_anonymity': params['filter_anonymity'],
+        'filter_protocol': params['filter_protocol'],
+        'filter_country': params['filter_country'],
+        'filter_tld': params['filter_tld']
+    }
+    if params['want']:
+        # Results are matched against the filters as they arrive
+        want_filters = filters
+        want_target = params['want']
+
+    run_info = {}
+    timeout_cap = filter_timeout_cap(filters['filter_status'])
+    if timeout_cap is not None and timeout_cap < timeout:
+        # A proxy slower than the slowest wanted speed category is thrown away anyway, so its
+        # request is cut short (see capped_timeouts()); probes and deadlines keep the full timeout
+        run_info["Timeout (capped by --filter-status)"] = f"{timeout_cap:g} s"
+    else:
+        timeout_cap = None
+
+    # Get the public IP address for anonymity checks
+    debug_print("Determining your public IP address...", "info", print_lock)
+    public_ip = get_public_ip()
+    debug_print(f"Your public IP: {public_ip}", "info", print_lock)
+
+    # Parse the proxies input
+    debug_print("Parsing proxies from input...", "info", print_lock)
+    if args.automatic_mode:
+        proxies = parse_proxies(args.proxy, auto_mode=True, keep_bare=params['detect_protocol'])
+    elif args.proxy:
+        proxies = parse_proxies(args.proxy, keep_bare=params['detect_protocol'])
+    else:
+        debug_print("Error: No proxy source specified. Use -p/--proxy or -A/--automatic-mode", "error", print_lock)
+        sys.exit(1)
+
+    total_proxies = len(proxies)
+
+    if total_proxies == 0:
+        debug_print("No valid proxies found. Exiting.", "error", print_lock)
+        sys.exit(1)
+
+    if params['detect_protocol']:
+        debug_print("Protocol detection: probing bare host:port entries...", "info", print_lock)
+        proxies, undetected = detect_protocols(proxies, timeout, params['prefilter_concurrency'], test_url)
+        # Endpoints speaking several protocols are checked once per protocol
+        total_proxies = len(proxies) + undetected
+        run_info["Dropped by protocol detection"] = undetected
+        debug_print(f"Protocol detection: {len(proxies)} proxies to check, {undetected} endpoints without a known protocol",
+                    "info", print_lock)
+
+    if filters['filter_protocol']:
+        checked = len(proxies)
+        proxies = pushdown_protocol_filter(proxies, filters['filter_protocol'])
+        run_info["Dropped by --filter-protocol"] = checked - len(proxies)
+
+    if params['geoip_database']:
+        geoip_offline = load_offline_geoip(params['geoip_database'])
+        geoip_online = params['geoip_online'] or geoip_offline is None
+        if geoip_offline is not None:
+            run_info["Offline GeoIP"] = geoip_offline.describe()
+    if geoip_offline is not None and (filters['filter_country'] or filters['filter_tld']):
+        checked = len(proxies)
+        proxies = pushdown_country_filter(proxies, filters['filter_country'], filters['filter_tld'])
+        run_info["Dropped by --filter-country/--filter-tld"] = checked - len(proxies)
+
+    if params['prefilter']:
+        checked = len(proxies)
+        debug_print(f"TCP pre-filter: connecting to {checked} endpoints...", "info", print_lock)
+        proxies = tcp_prefilter(proxies, timeout, params['prefilter_concurrency'])
+        dropped = checked - len(proxies)
+        run_info["Dropped by TCP pre-filter"] = dropped
+        debug_print(f"TCP pre-filter: {len(proxies)} reachable, {dropped} dropped", "info", print_lock)
+
+    history_file = params['history_file']
+    if history_file:
+        proxies, known_good = order_by_history(proxies, load_history(history_file))
+        run_info["Worked in the previous run"] = known_good
+        debug_print(f"History: checking {known_good} proxies that worked last time first", "info", print_lock)
+
+    debug_print(f"Testing {len(proxies)} proxies with a timeout of {timeout} seconds", "info", print_lock)
+    if global_args.debug:
+        debug_print("Debug mode enabled - showing detailed information", "debug", print_lock)
+
+    # Initialize progress tracking
+    progress_info = {
+        'current': 0,
+        'total': len(proxies)
+    }
+
+    if params['level'] < LEVEL_FULL:
+        # Below level 3 there is nothing to enrich, so no enrichment stage either
+        params['enrich_workers'] = 0
+        debug_print(f"Check level {params['level']}: anonymity, GeoIP and reverse DNS are skipped", "info", print_lock)
+
+    options = {
+        'single_request': params['single_request'],
+        'enrich_workers': params['enrich_workers'],
+        'max_bytes': params['max_bytes'],
+        'speed_basis': params['speed_basis'],
+        'level': params['level'],
+        'retry_policy': params['retry_policy'],
+        'hedge_percentile': params['hedge_percentile'],
+        'processes': process_count,
+        'max_per_host': params['max_per_host'],
+        'max_per_subnet': params['max_per_subnet'],
+        'deadline': run_deadline,
+        'filters': filters,
+        'first_pass_timeout': params['first_pass_timeout'] if params['first_pass_timeout'] < timeout else 0,
+        'adaptive_timeout': None,
+        'timeout_cap': timeout_cap,
+        'request_deadline': request_deadline,
+        'max_response_bytes': max_response_bytes,
+        'geoip_cache': None,
+        'geoip_database': params['geoip_database'] if geoip_offline is not None else '',
+        'geoip_online': geoip_online,
+        'cache_size': params['cache_size']
+    }
+    create_caches(params['cache_size'])
+    if params['geoip_cache_file'] and params['level'] >= LEVEL_FULL:
+        ttl, negative_ttl = params['geoip_cache_ttl']
+        options['geoip_cache'] = (params['geoip_cache_file'], ttl * 3600, negative_ttl * 3600)
+        if process_count == 1:
+            geoip_store = open_geoip_store(options['geoip_cache'])
+    if params['adaptive_timeout']:
+        percentile, factor, minimum, maximum = params['timeout_tuning']
+        options['adaptive_timeout'] = (percentile, factor, min(minimum, maximum), maximum)
+        if process_count == 1:
+            timeout_tuner = TimeoutTuner(*options['adaptive_timeout'])
+        debug_print(f"Adaptive timeout enabled (p{percentile:g} x {factor:g}, bounds {min(minimum, maximum):g}-{maximum:g} s)",
+                    "info", print_lock)
+    if options['first_pass_timeout']:
+        debug_print(f"Two-pass check: first pass with {options['first_pass_timeout']:g} s, proxies that time out again with {timeout:g} s",
+                    "info", print_lock)
+    if params['hedge_percentile'] and engine != ENGINE_ASYNCIO:
+        debug_print("Hedged requests need --engine asyncio; --hedge is ignored", "warning", print_lock)
+    check_args = (test_url, timeout, public_ip, anonymity_check_url, progress_info, config, reverse_lookup, options)
+    rate_limiters = load_rate_limiters(config)
+    if rate_limiters:
+        debug_print(f"Rate limits: {', '.join(f'{host} {limiter.rate:g}/s' for host, limiter in rate_limiters.items())}", "info", print_lock)
+    rate_limit_stats = {}
+    geoip_cache_stats = {}
+    cache_stats = {}
+
+    adaptive_bounds = params['adaptive_bounds'] if params['adaptive'] else None
+    if adaptive_bounds and process_count == 1:
+        concurrency_controller = ConcurrencyController(thread_count, *adaptive_bounds)
+        debug_print(f"Adaptive concurrency enabled (start {concurrency_controller.limit}, bounds {adaptive_bounds[0]}-{adaptive_bounds[1]})", "info", print_lock)
+
+    if process_count > 1:
+        debug_print(f"Starting proxy checks in {process_count} processes with {thread_count} concurrent checks each ({engine} engine)", "info", print_lock)
+        shard_args = (test_url, timeout, public_ip, anonymity_check_url, reverse_lookup, options)
+        worker_stats = run_sharded_checks(proxies, process_count, engine, thread_count, shard_args, config, adaptive_bounds)
+        if adaptive_bounds:
+            settled = ", ".join(str(stats["adaptive"]) for stats in worker_stats if "adaptive" in stats)
+            run_info["Adaptive concurrency"] = f"settled at {settled} per process"
+        for index, stats in enumerate(worker_stats, 1):
+            if "timeout" in stats:
+                run_info[f"Process {index} adaptive timeout"] = stats["timeout"]
+            for name, description in stats.get("pipeline", {}).items():
+                run_info[f"Process {index} {name} stage"] = description
+            for key, value in stats.get("retries", {}).items():
+                retry_stats[key] += value
+            for key, value in stats.get("geoip_cache", {}).items():
+                # Every process loads the same file, but looks up and stores its own entries
+                previous = geoip_cache_stats.get(key, 0)
+                geoip_cache_stats[key] = max(previous, value) if key == "loaded" else previous + value
+            for name, counters in stats.get("caches", {}).items():
+                merged = cache_stats.setdefault(name, dict.fromkeys(counters, 0))
+                for key, value in counters.items():
+                    merged[key] += value
+            for host, counters in stats.get("rate_limits", {}).items():
+                merged = rate_limit_stats.setdefault(host, dict.fromkeys(counters, 0))
+                for key, value in counters.items():
+                    merged[key] = max(merged[key], value) if key == "max_wait" else merged[key] + value
+    elif engine == ENGINE_ASYNCIO:
+        # Coroutines on a single event loop; -c is the number of checks in flight
+        debug_print(f"Starting proxy checks with up to {thread_count} concurrent checks (asyncio engine)", "info", print_lock)
+        run_asyncio_engine(proxies, thread_count, check_args, params['enrich_workers'])
+    else:
+        # Use ThreadPoolExecutor for improved parallelization
+        debug_print(f"Starting proxy checks with {thread_count} concurrent workers", "info", print_lock)
+        run_threaded_checks(proxies, thread_count, check_args, params['enrich_workers'])
+
+    if concurrency_controller is not None:
+        run_info["Adaptive concurrency"] = concurrency_controller.describe()
+    if timeout_tuner is not None:
+        run_info["Adaptive timeout"] = timeout_tuner.describe()
+    for name, stage in pipeline_stages.items():
+        run_info[f"Pipeline {name} stage"] = stage.describe()
+    retries = describe_retries(retry_stats, options)
+    if retries:
+        run_info["Retries"] = retries
+    if run_deadline is not None:
+        skipped = max(0, len(proxies) - len(global_results))
+        run_info["Skipped (time budget)"] = skipped
+        if skipped:
+            debug_print(f"Time budget used up: {skipped} proxies were not checked", "warning", print_lock)
+    if want_target:
+        run_info["Wanted proxies found"] = f"{want_found} of {want_target}"
+        if early_stop.is_set():
+            debug_print(f"Found {want_found} wanted proxies - stopped early", "success", print_lock)
+            run_info["Not checked (early stop)"] = max(0, len(proxies) - len(global_results))
+    if process_count == 1:
+        rate_limit_stats = {host: limiter.stats() for host, limiter in rate_limiters.items()}
+    for host, counters in rate_limit_stats.items():
+        run_info[f"Rate limit {host}"] = describe_rate_limit(counters)
+    if geoip_store is not None:
+        geoip_store.close()
+        geoip_cache_stats = geoip_store.stats()
+    if geoip_cache_stats:
+        run_info["GeoIP cache file"] = describe_geoip_store(geoip_cache_stats)
+    if process_count == 1:
+        cache_stats = {cache.name: cache.stats() for cache in (geoip_cache, rdns_cache)}
+    for name, counters in cache_stats.items():
+        description = describe_cache(counters, params['cache_size'])
+        debug_print(f"{name} cache: {description}", "debug", print_lock)
+        if counters['hits'] + counters['misses']:
+            run_info[f"{name} cache"] = description
+
+    # Save final results
+    debug_print("\nAll proxy checks completed!", "success", print_lock)
+    if output_format:
+        debug_print("Saving final results...", "info", print_lock)
+        save_results(global_results, output_format, filters, config)
+
+    # Save final autosave
+    autosave_results(global_results, config, in_progress=False)
+
+    if history_file and params['level'] < LEVEL_REQUEST:
+        # An open port or a proxy handshake does not show that the proxy forwards requests
+        debug_print(f"Check level {params['level']}: history not updated", "info", print_lock)
+    elif history_file:
+        # Under the --filter-status cap a failure may only mean "too slow for this run"
+        update_history(history_file, global_results if timeout_cap is None else
+                       [result for result in global_results if result["status"] != STATUS_FAILED])
 
     # Print summary statistics
-    print_summary_statistics(global_results, total_proxies)
+    print_summary_statistics(global_results, total_proxies, run_info)
 
 # Entry point
 if __name__ == '__main__':